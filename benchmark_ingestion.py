@@ -0,0 +1,230 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from parse_cache import SheetCache
+from synthetic_workbooks import PORTUGUESE_MONTHS, generate_workbook
+from verbatim_search import build_verbatim_index
+from workshop_parser import (MONTH_ORDER, SURVEY_METRICS, WorkbookReader, build_filter_index,
+                             build_metrics_table, build_tables, build_workbook_model, extract_data_from_sheet,
+                             is_workshop_sheet, locate_sections, sheet_fingerprints)
+
+DEFAULT_SIZES = [10, 100, 1000]
+
+# Huellas de las tablas de la extracción original (revisión fb87fe6, todo en satisfactionsurvey.py)
+# para los libros sintéticos de la medición; también las usan las pruebas de tests/
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_golden.json")
+
+# Meses en portugués que la extracción original no reconocía: el mes de esas hojas no se compara
+UNRECOGNIZED_MONTHS = [month.lower() for month in PORTUGUESE_MONTHS if month not in MONTH_ORDER]
+
+# Mejor tiempo (en segundos) de varias ejecuciones de una función
+def best_time(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+# Pico de memoria (en MB) asignada por Python durante una función
+def peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+# Tiempo acumulado de cada etapa de la ingesta, ejecutadas por separado
+def stage_timings(data, workshops):
+    timings = {}
+    
+    def timed(stage, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+        return result
+    
+    with timed("apertura", WorkbookReader, data) as reader:
+        for name in reader.sheet_names:
+            df = timed("lectura", reader.read, name)
+            sections = timed("secciones", locate_sections, df)
+            if timed("deteccion", is_workshop_sheet, df, name, sections):
+                timed("extraccion", extract_data_from_sheet, df, sections)
+    timed("huellas", sheet_fingerprints, data)
+    timed("indice_filtros", build_filter_index, workshops)
+    timed("tabla_metricas", build_metrics_table, workshops)
+    timed("indice_verbatims", build_verbatim_index, workshops)
+    return timings
+
+# Tablas comparables entre la extracción original y la actual: solo los datos que
+# la original ya extraía, con las métricas como números redondeados
+def comparable_frames(talleres, facilitadores, fishbowl, verbatims):
+    talleres = pd.DataFrame(talleres, columns=["hoja", "pais", "mes", *SURVEY_METRICS])
+    talleres[SURVEY_METRICS] = talleres[SURVEY_METRICS].astype(float).round(6)
+    unrecognized = talleres["hoja"].str.lower().apply(lambda name: any(month in name for month in UNRECOGNIZED_MONTHS))
+    talleres.loc[unrecognized, "mes"] = None
+    return {
+        "talleres": talleres,
+        "facilitadores": pd.DataFrame(facilitadores, columns=["hoja", "nombre", "empresa"]),
+        "fishbowl": pd.DataFrame(fishbowl, columns=["hoja", "nombre"]),
+        "verbatims": pd.DataFrame(verbatims, columns=["hoja", "orden", "texto"])
+    }
+
+# Las mismas tablas comparables a partir de los talleres extraídos con workshop_parser
+def current_tables(workshops):
+    return comparable_frames(
+        [
+            {"hoja": w.sheet_name, "pais": w.country, "mes": w.month, **dict(zip(SURVEY_METRICS, w.metric_values))}
+            for w in workshops
+        ],
+        [
+            {"hoja": w.sheet_name, "nombre": facilitator.name, "empresa": facilitator.company}
+            for w in workshops for facilitator in w.facilitadores
+        ],
+        [{"hoja": w.sheet_name, "nombre": name} for w in workshops for name in w.fishbowl],
+        [{"hoja": w.sheet_name, "orden": i + 1, "texto": text} for w in workshops for i, text in enumerate(w.verbatims)]
+    )
+
+# Diferencias entre dos conjuntos de tablas (lista vacía si son iguales)
+def compare_tables(expected_tables, actual_tables):
+    differences = []
+    for name, table in expected_tables.items():
+        try:
+            pd.testing.assert_frame_equal(table, actual_tables[name], check_dtype=False)
+        except AssertionError as e:
+            differences.append(f"{name}: {str(e).splitlines()[0]}")
+    return differences
+
+# Huella de un conjunto de tablas
+def frames_digest(tables):
+    digest = hashlib.sha256()
+    for name, table in tables.items():
+        digest.update(name.encode())
+        digest.update(table.to_csv(index=False).encode())
+    return digest.hexdigest()
+
+# Huella de las tablas normalizadas, para detectar cambios de resultados entre versiones
+def tables_digest(workshops):
+    return frames_digest(build_tables(workshops))
+
+# Clave de un libro sintético en el archivo de huellas de referencia
+def golden_key(sheets, verbatims, noise, seed):
+    return f"{sheets}/{verbatims}/{noise}/{seed}"
+
+# Huellas guardadas de la extracción original ({} si no hay archivo)
+def load_golden(path=GOLDEN_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+# Medir y verificar la ingesta de un libro sintético de n hojas.
+# golden: {clave: huella} de la extracción original (los libros sin huella no se comparan)
+def run_benchmark(sheets, verbatims=15, noise=0.1, seed=0, workers=1, repeat=3, golden=None):
+    data = generate_workbook(sheets, verbatims, noise, seed)
+    result = {"hojas": sheets, "bytes": len(data)}
+    
+    result["total_s"], model = best_time(lambda: build_workbook_model(data, workers=workers), repeat)
+    result["memoria_mb"] = peak_memory(lambda: build_workbook_model(data, workers=workers))
+    result["etapas_s"] = stage_timings(data, list(model.workshops))
+    result["talleres"] = len(model.workshops)
+    result["digest"] = tables_digest(model.workshops)
+    
+    # Caché de hojas: primera carga (vacía) y segunda carga (todas las hojas en caché)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = SheetCache(cache_dir)
+        start = time.perf_counter()
+        build_workbook_model(data, workers=workers, cache=cache)
+        result["cache_fria_s"] = time.perf_counter() - start
+        result["cache_caliente_s"], cached_model = best_time(
+            lambda: build_workbook_model(data, workers=workers, cache=cache), repeat
+        )
+    
+    # Equivalencias: caché frente al camino normal y extracción original frente a la actual
+    differences = [
+        f"caché: {d}" for d in compare_tables(build_tables(model.workshops), build_tables(cached_model.workshops))
+    ]
+    actual = current_tables(model.workshops)
+    result["digest_original"] = frames_digest(actual)
+    expected = (golden or {}).get(golden_key(sheets, verbatims, noise, seed))
+    if expected is not None and expected != result["digest_original"]:
+        differences.append(f"original: las tablas no coinciden con {os.path.basename(GOLDEN_PATH)}")
+    result["diferencias"] = differences
+    return result
+
+# Resultados en forma de tabla legible
+def format_results(results):
+    lines = []
+    for result in results:
+        lines.append(
+            f"{result['hojas']:>5} hojas ({result['talleres']} talleres, {result['bytes'] / 1024:.0f} KB): "
+            f"total {result['total_s']:.3f}s · pico {result['memoria_mb']:.1f} MB · "
+            f"caché fría {result['cache_fria_s']:.3f}s · caliente {result['cache_caliente_s']:.3f}s"
+        )
+        lines.append("      " + " · ".join(f"{stage} {seconds:.3f}s" for stage, seconds in result["etapas_s"].items()))
+        for difference in result["diferencias"]:
+            lines.append(f"      DIFERENCIA {difference}")
+    return "\n".join(lines)
+
+# Comparar las huellas con una línea base guardada (o crearla si no existe)
+def check_baseline(results, path, update=False):
+    digests = {str(result["hojas"]): result["digest"] for result in results}
+    try:
+        with open(path, encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+    
+    changed = [size for size, digest in digests.items() if size in baseline and baseline[size] != digest]
+    if update or not baseline:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({**baseline, **digests}, f, indent=2)
+    return [] if update else changed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el tiempo y la memoria de la ingesta con libros sintéticos")
+    parser.add_argument("-s", "--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Número de hojas de cada libro")
+    parser.add_argument("-v", "--verbatims", type=int, default=15, help="Verbatims por taller")
+    parser.add_argument("-n", "--noise", type=float, default=0.1, help="Probabilidad de variaciones (0-1)")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Procesos para analizar las hojas")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Repeticiones por medición (se toma la mejor)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla aleatoria")
+    parser.add_argument("--baseline", help="JSON con las huellas de resultados esperadas")
+    parser.add_argument("--update-baseline", action="store_true", help="Reemplazar las huellas de la línea base")
+    parser.add_argument("--skip-reference", action="store_true", help="No comparar con la extracción original")
+    parser.add_argument("--json", help="Guardar los resultados en este archivo JSON")
+    args = parser.parse_args(argv)
+    
+    # Referencia: huellas guardadas de la extracción original
+    golden = {} if args.skip_reference else load_golden()
+    
+    results = []
+    for sheets in args.sizes:
+        result = run_benchmark(sheets, args.verbatims, args.noise, args.seed, args.workers, args.repeat, golden)
+        results.append(result)
+        print(format_results([result]), flush=True)
+    
+    failed = any(result["diferencias"] for result in results)
+    if args.baseline:
+        changed = check_baseline(results, args.baseline, args.update_baseline)
+        for size in changed:
+            print(f"Los resultados con {size} hojas no coinciden con la línea base", file=sys.stderr)
+        failed = failed or bool(changed)
+    
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,438 @@
+import itertools
+import os
+import pickle
+import sqlite3
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from facilitator_analytics import FacilitatorRollups, rollup_increments
+from parse_cache import DEFAULT_CACHE_DIR
+from verbatim_search import build_verbatim_index
+from workshop_parser import (
+    FILTER_FACETS,
+    SURVEY_METRICS,
+    Facilitator,
+    WorkbookModel,
+    Workshop,
+    hash_workbook_bytes,
+    parse_workbook,
+    sheet_fingerprints,
+    sort_facet_values,
+    workshop_facets,
+)
+
+# Archivo del histórico de talleres (configurable en el servidor con ENCUESTAS_CORPUS_PATH)
+DEFAULT_CORPUS_PATH = os.environ.get("ENCUESTAS_CORPUS_PATH", os.path.join(DEFAULT_CACHE_DIR, "historico.sqlite"))
+
+# Versión del histórico (PRAGMA user_version). Al cambiar, las tablas derivadas
+# (facetas y acumulados) se recrean y se recalculan desde las tablas de talleres.
+# 1: acumulados por facilitador.
+# 2: acumulados por nombre, con el número de talleres en los que figura como Axialent.
+# 3: talleres en tablas normalizadas (antes, objetos Workshop guardados con pickle).
+STORE_VERSION = 3
+
+# Tablas de acumulados por facilitador
+ROLLUP_TABLES = (
+    "facilitator_workshops", "facilitator_stats", "facilitator_histogram", "facilitator_periods", "facilitator_pairs"
+)
+
+# Tablas que se calculan a partir de los talleres guardados
+DERIVED_TABLES = ("workshop_facets", *ROLLUP_TABLES)
+
+# Vaciar las tablas de acumulados por facilitador
+ROLLUP_RESET = "".join(f"DELETE FROM {table};" for table in ROLLUP_TABLES)
+
+# Histórico de talleres de muchos libros Excel en una base SQLite local.
+# Cada taller se guarda una sola vez por (nombre de hoja, huella del contenido)
+# en tablas normalizadas con las mismas filas que exporta build_tables (talleres,
+# métricas, facilitadores, fishbowl y verbatims). A partir de ellas se calculan
+# las facetas para filtrar con consultas y los acumulados por facilitador, que se
+# actualizan al agregar cada taller y se recalculan si cambia STORE_VERSION.
+class CorpusStore:
+    def __init__(self, path=DEFAULT_CORPUS_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        with self._connect() as conn:
+            # Históricos de una versión anterior: las tablas derivadas se recalculan más abajo
+            upgrade = conn.execute("PRAGMA user_version").fetchone()[0] < STORE_VERSION
+            legacy = []
+            if upgrade:
+                conn.executescript("".join(f"DROP TABLE IF EXISTS {table};" for table in DERIVED_TABLES))
+                columns = [row[1] for row in conn.execute("PRAGMA table_info(workshops)")]
+                if "payload" in columns:
+                    # Talleres guardados con pickle: se pasan a las tablas normalizadas
+                    legacy = conn.execute(
+                        "SELECT id, sheet_name, fingerprint, workbook_hash, payload FROM workshops ORDER BY id"
+                    ).fetchall()
+                    conn.executescript("DROP TABLE workshops; DELETE FROM metrics;")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS workbooks (
+                    content_hash TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    added_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS workshops (
+                    id INTEGER PRIMARY KEY,
+                    sheet_name TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    workbook_hash TEXT NOT NULL,
+                    pais TEXT NOT NULL,
+                    mes TEXT NOT NULL,
+                    anio TEXT NOT NULL,
+                    UNIQUE (sheet_name, fingerprint)
+                );
+                CREATE TABLE IF NOT EXISTS workshop_facilitators (
+                    workshop_id INTEGER NOT NULL,
+                    nombre TEXT NOT NULL,
+                    empresa TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS workshop_facilitators_workshop ON workshop_facilitators (workshop_id);
+                CREATE TABLE IF NOT EXISTS workshop_fishbowl (
+                    workshop_id INTEGER NOT NULL,
+                    nombre TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS workshop_fishbowl_workshop ON workshop_fishbowl (workshop_id);
+                CREATE TABLE IF NOT EXISTS workshop_verbatims (
+                    workshop_id INTEGER NOT NULL,
+                    orden INTEGER NOT NULL,
+                    texto TEXT NOT NULL,
+                    PRIMARY KEY (workshop_id, orden)
+                );
+                CREATE TABLE IF NOT EXISTS workshop_facets (
+                    workshop_id INTEGER NOT NULL,
+                    facet TEXT NOT NULL,
+                    value TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS workshop_facets_value ON workshop_facets (facet, value);
+                CREATE INDEX IF NOT EXISTS workshop_facets_workshop ON workshop_facets (workshop_id, facet);
+                CREATE TABLE IF NOT EXISTS metrics (
+                    workshop_id INTEGER NOT NULL,
+                    metrica TEXT NOT NULL,
+                    valor REAL
+                );
+                CREATE INDEX IF NOT EXISTS metrics_workshop ON metrics (workshop_id);
+                CREATE TABLE IF NOT EXISTS facilitator_workshops (
+                    facilitador TEXT PRIMARY KEY,
+                    talleres INTEGER NOT NULL,
+                    axialent INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS facilitator_stats (
+                    facilitador TEXT NOT NULL,
+                    metrica TEXT NOT NULL,
+                    conteo INTEGER NOT NULL,
+                    suma REAL NOT NULL,
+                    PRIMARY KEY (facilitador, metrica)
+                );
+                CREATE TABLE IF NOT EXISTS facilitator_histogram (
+                    facilitador TEXT NOT NULL,
+                    metrica TEXT NOT NULL,
+                    intervalo INTEGER NOT NULL,
+                    conteo INTEGER NOT NULL,
+                    PRIMARY KEY (facilitador, metrica, intervalo)
+                );
+                CREATE TABLE IF NOT EXISTS facilitator_periods (
+                    facilitador TEXT NOT NULL,
+                    anio TEXT NOT NULL,
+                    mes TEXT NOT NULL,
+                    metrica TEXT NOT NULL,
+                    conteo INTEGER NOT NULL,
+                    suma REAL NOT NULL,
+                    PRIMARY KEY (facilitador, anio, mes, metrica)
+                );
+                CREATE TABLE IF NOT EXISTS facilitator_pairs (
+                    facilitador TEXT NOT NULL,
+                    cofacilitador TEXT NOT NULL,
+                    talleres INTEGER NOT NULL,
+                    PRIMARY KEY (facilitador, cofacilitador)
+                );
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO meta VALUES ('generation', 0);
+            """)
+            if upgrade:
+                for workshop_id, sheet_name, fingerprint, workbook_hash, payload in legacy:
+                    self._insert_workshop(conn, pickle.loads(payload), fingerprint, workbook_hash, workshop_id)
+                # Facetas y acumulados calculados de nuevo desde las tablas de talleres
+                for workshop_id, workshop in self._load_workshops(conn):
+                    self._add_derived(conn, workshop_id, workshop)
+                conn.execute(f"PRAGMA user_version = {STORE_VERSION}")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    # Agregar un libro al histórico. Devuelve (talleres nuevos, errores por hoja).
+    # Un libro ya cargado (mismo contenido) no se vuelve a procesar.
+    def add_workbook(self, name, data, workers=1, cache=None, profile=None):
+        content_hash = hash_workbook_bytes(data)
+        with self._connect() as conn:
+            if conn.execute("SELECT 1 FROM workbooks WHERE content_hash = ?", (content_hash,)).fetchone():
+                return 0, []
+        
+        # Las hojas de .xls no tienen huella propia: se identifican por el libro
+        fingerprints = sheet_fingerprints(data)
+        errors = []
+        added = 0
+        with self._connect() as conn:
+            for sheet_name, workshop, error in parse_workbook(data, workers, cache, profile):
+                if error is not None:
+                    errors.append((sheet_name, error))
+                    continue
+                if workshop is None:
+                    continue
+                errors.extend((sheet_name, message) for message in workshop.errores)
+                fingerprint = fingerprints.get(sheet_name, f"{content_hash}:{sheet_name}")
+                workshop_id = self._insert_workshop(conn, workshop, fingerprint, content_hash)
+                if workshop_id is None:
+                    # Taller repetido: ya estaba en el histórico
+                    continue
+                self._add_derived(conn, workshop_id, workshop)
+                added += 1
+            # Otra sesión pudo agregar el mismo libro mientras se procesaba
+            conn.execute(
+                "INSERT OR IGNORE INTO workbooks (content_hash, name, added_at) VALUES (?, ?, ?)",
+                (content_hash, name, time.time())
+            )
+            self._bump_generation(conn)
+        return added, errors
+
+    # Guardar un taller en las tablas normalizadas. Devuelve su id, o None si ya estaba.
+    # Día y etiqueta no se guardan: salen del nombre de la hoja al leerlo.
+    def _insert_workshop(self, conn, workshop, fingerprint, workbook_hash, workshop_id=None):
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO workshops (id, sheet_name, fingerprint, workbook_hash, pais, mes, anio)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (workshop_id, workshop.sheet_name, fingerprint, workbook_hash, workshop.country, workshop.month, workshop.year)
+        )
+        if cursor.rowcount == 0:
+            return None
+        workshop_id = cursor.lastrowid
+        conn.executemany(
+            "INSERT INTO metrics (workshop_id, metrica, valor) VALUES (?, ?, ?)",
+            [
+                (workshop_id, metric, None if pd.isna(value) else float(value))
+                for metric, value in workshop.metricas.items()
+            ]
+        )
+        conn.executemany(
+            "INSERT INTO workshop_facilitators (workshop_id, nombre, empresa) VALUES (?, ?, ?)",
+            [(workshop_id, facilitator.name, facilitator.company) for facilitator in workshop.facilitadores]
+        )
+        conn.executemany(
+            "INSERT INTO workshop_fishbowl (workshop_id, nombre) VALUES (?, ?)",
+            [(workshop_id, nombre) for nombre in workshop.fishbowl]
+        )
+        conn.executemany(
+            "INSERT INTO workshop_verbatims (workshop_id, orden, texto) VALUES (?, ?, ?)",
+            [(workshop_id, i + 1, verbatim) for i, verbatim in enumerate(workshop.verbatims)]
+        )
+        return workshop_id
+
+    # Sumar un taller a las tablas derivadas: facetas y acumulados por facilitador
+    def _add_derived(self, conn, workshop_id, workshop):
+        conn.executemany(
+            "INSERT INTO workshop_facets (workshop_id, facet, value) VALUES (?, ?, ?)",
+            [(workshop_id, facet, str(value)) for facet, value in workshop_facets(workshop)]
+        )
+        self._add_rollups(conn, rollup_increments(workshop))
+
+    # Reconstruir los talleres guardados: [(id, Workshop)] en orden de llegada
+    def _load_workshops(self, conn):
+        metrics = _grouped(conn.execute("SELECT workshop_id, metrica, valor FROM metrics ORDER BY workshop_id"))
+        facilitators = _grouped(conn.execute(
+            "SELECT workshop_id, nombre, empresa FROM workshop_facilitators ORDER BY workshop_id, rowid"
+        ))
+        fishbowl = _grouped(conn.execute("SELECT workshop_id, nombre FROM workshop_fishbowl ORDER BY workshop_id, rowid"))
+        verbatims = _grouped(conn.execute(
+            "SELECT workshop_id, texto FROM workshop_verbatims ORDER BY workshop_id, orden"
+        ))
+        workshops = []
+        for workshop_id, sheet_name, country, month, year in conn.execute(
+            "SELECT id, sheet_name, pais, mes, anio FROM workshops ORDER BY id"
+        ):
+            values = dict(metrics.get(workshop_id, ()))
+            workshops.append((workshop_id, Workshop(
+                sheet_name=sheet_name,
+                country=country,
+                month=month,
+                year=year,
+                facilitadores=tuple(
+                    Facilitator(sys.intern(name), sys.intern(company))
+                    for name, company in facilitators.get(workshop_id, ())
+                ),
+                fishbowl=tuple(sys.intern(name) for (name,) in fishbowl.get(workshop_id, ())),
+                verbatims=tuple(text for (text,) in verbatims.get(workshop_id, ())),
+                metric_values=tuple(
+                    np.nan if values.get(metric) is None else values[metric] for metric in SURVEY_METRICS
+                )
+            )))
+        return workshops
+
+    # Avanzar la generación del histórico para invalidar modelos y acumulados en caché
+    def _bump_generation(self, conn):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+
+    # Sumar los incrementos de un taller a los acumulados por facilitador
+    def _add_rollups(self, conn, increments):
+        conn.executemany(
+            "INSERT INTO facilitator_workshops VALUES (?, 1, ?)"
+            " ON CONFLICT (facilitador) DO UPDATE SET talleres = talleres + 1, axialent = axialent + excluded.axialent",
+            increments["talleres"]
+        )
+        conn.executemany(
+            "INSERT INTO facilitator_stats VALUES (?, ?, 1, ?)"
+            " ON CONFLICT (facilitador, metrica) DO UPDATE SET conteo = conteo + 1, suma = suma + excluded.suma",
+            increments["estadisticas"]
+        )
+        conn.executemany(
+            "INSERT INTO facilitator_histogram VALUES (?, ?, ?, 1)"
+            " ON CONFLICT (facilitador, metrica, intervalo) DO UPDATE SET conteo = conteo + 1",
+            increments["histograma"]
+        )
+        conn.executemany(
+            "INSERT INTO facilitator_periods VALUES (?, ?, ?, ?, 1, ?)"
+            " ON CONFLICT (facilitador, anio, mes, metrica) DO UPDATE SET conteo = conteo + 1, suma = suma + excluded.suma",
+            increments["periodos"]
+        )
+        conn.executemany(
+            "INSERT INTO facilitator_pairs VALUES (?, ?, 1)"
+            " ON CONFLICT (facilitador, cofacilitador) DO UPDATE SET talleres = talleres + 1",
+            increments["pares"]
+        )
+
+    # Acumulados por facilitador de todo el histórico, leídos sin recorrer los talleres
+    def load_rollups(self):
+        rollups = FacilitatorRollups()
+        with self._connect() as conn:
+            for name, count, axialent in conn.execute("SELECT * FROM facilitator_workshops"):
+                rollups.workshops[name] = count
+                rollups.axialent[name] = axialent
+            for name, metric, count, total in conn.execute("SELECT * FROM facilitator_stats"):
+                rollups.stats[(name, metric)] = [count, total]
+            for name, metric, bin_index, count in conn.execute("SELECT * FROM facilitator_histogram"):
+                rollups.add_histogram((name, metric), bin_index, count)
+            for name, year, month, metric, count, total in conn.execute("SELECT * FROM facilitator_periods"):
+                rollups.periods[(name, year, month, metric)] = [count, total]
+            for name, other, count in conn.execute("SELECT * FROM facilitator_pairs"):
+                rollups.pairs[(name, other)] = count
+        return rollups
+
+    # Versión del histórico: generación que avanza al agregar libros y al vaciarlo
+    # (los ids de talleres se reutilizan después de vaciar, así que no sirven como versión)
+    def version(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    # Número de libros y de talleres guardados
+    def stats(self):
+        with self._connect() as conn:
+            workbooks = conn.execute("SELECT COUNT(*) FROM workbooks").fetchone()[0]
+            workshops = conn.execute("SELECT COUNT(*) FROM workshops").fetchone()[0]
+        return workbooks, workshops
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.executescript(
+                "DELETE FROM metrics; DELETE FROM workshop_facilitators; DELETE FROM workshop_fishbowl;"
+                " DELETE FROM workshop_verbatims; DELETE FROM workshop_facets; DELETE FROM workshops;"
+                " DELETE FROM workbooks;" + ROLLUP_RESET
+            )
+            self._bump_generation(conn)
+
+    # Tabla larga de métricas (mismo formato que build_metrics_table) consultada en SQLite.
+    # positions traduce el id de cada taller a su posición dentro del modelo cargado.
+    def metrics_table(self, positions):
+        query = """
+            SELECT w.id AS workshop_id, w.sheet_name AS taller, w.pais, w.mes, w.anio AS "año",
+                   (SELECT group_concat(f.nombre, char(31)) FROM workshop_facilitators f
+                    WHERE f.workshop_id = w.id) AS facilitadores,
+                   m.metrica, m.valor
+            FROM metrics m
+            JOIN workshops w ON w.id = m.workshop_id
+            ORDER BY w.id, m.rowid
+        """
+        with self._connect() as conn:
+            table = pd.read_sql_query(query, conn)
+        table.insert(0, "posicion", table.pop("workshop_id").map(positions))
+        table["facilitadores"] = [
+            tuple(dict.fromkeys(names.split("\x1f"))) if isinstance(names, str) else ()
+            for names in table["facilitadores"]
+        ]
+        table["valor"] = table["valor"].astype(float)
+        return table[["posicion", "taller", "pais", "mes", "año", "facilitadores", "metrica", "valor"]]
+
+    # Cargar el histórico como un WorkbookModel cuyos filtros se resuelven con consultas
+    def load_model(self):
+        with self._connect() as conn:
+            loaded = self._load_workshops(conn)
+            rows = conn.execute("""
+                SELECT w.workbook_hash, b.name
+                FROM workshops w LEFT JOIN workbooks b ON b.content_hash = w.workbook_hash
+                ORDER BY w.id
+            """).fetchall()
+        ids = [workshop_id for workshop_id, workshop in loaded]
+        workshops = tuple(workshop for workshop_id, workshop in loaded)
+        return WorkbookModel(
+            content_hash=f"corpus:{self.path}:{self.version()}",
+            workshops=workshops,
+            errors=(),
+            filter_index=CorpusFilterIndex(self, ids),
+            metrics_table=self.metrics_table({workshop_id: position for position, workshop_id in enumerate(ids)}),
+            verbatim_index=build_verbatim_index(workshops),
+            sources=workbook_sources(rows),
+            rollups=self.load_rollups()
+        )
+
+# Filas de una consulta agrupadas por su primera columna: {id: [resto de columnas]}
+# (la consulta debe venir ordenada por esa columna)
+def _grouped(rows):
+    return {key: [row[1:] for row in group] for key, group in itertools.groupby(rows, key=lambda row: row[0])}
+
+# Nombre del libro de origen de cada taller; si dos libros distintos tienen el mismo
+# nombre de archivo se agrega el inicio de su huella para distinguirlos
+def workbook_sources(workbooks):
+    hashes_by_name = {}
+    for content_hash, name in workbooks:
+        hashes_by_name.setdefault(name, set()).add(content_hash)
+    return tuple(
+        name if name is not None and len(hashes_by_name[name]) == 1 else f"{name or 'libro'} ({content_hash[:8]})"
+        for content_hash, name in workbooks
+    )
+
+# Índice de filtros del histórico: misma interfaz que FilterIndex, resuelto en SQLite
+class CorpusFilterIndex:
+    def __init__(self, store, ids):
+        self.store = store
+        self.size = len(ids)
+        # Posición de cada taller dentro del modelo cargado
+        self.positions = {workshop_id: position for position, workshop_id in enumerate(ids)}
+
+    # Valores disponibles de una faceta, ya ordenados
+    def values(self, facet):
+        with self.store._connect() as conn:
+            rows = conn.execute("SELECT DISTINCT value FROM workshop_facets WHERE facet = ?", (facet,)).fetchall()
+        return sort_facet_values(facet, [row[0] for row in rows]) if facet in FILTER_FACETS else []
+
+    # Posiciones (ordenadas) de los talleres que cumplen todos los filtros
+    def select(self, selections):
+        conditions = []
+        params = []
+        for facet, values in selections.items():
+            if not values or "Todos" in values:
+                continue
+            placeholders = ",".join("?" * len(values))
+            conditions.append(
+                f"id IN (SELECT workshop_id FROM workshop_facets WHERE facet = ? AND value IN ({placeholders}))"
+            )
+            params.extend([facet, *[str(value) for value in values]])
+        if not conditions:
+            return list(range(self.size))
+        
+        query = "SELECT id FROM workshops WHERE " + " AND ".join(conditions)
+        with self.store._connect() as conn:
+            ids = [row[0] for row in conn.execute(query, params)]
+        return sorted(self.positions[workshop_id] for workshop_id in ids if workshop_id in self.positions)
@@ -0,0 +1,125 @@
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+
+from facilitator_analytics import AXIALENT, EXTERNAL
+from workshop_parser import MONTH_ORDER, SURVEY_METRICS
+
+# Orden cronológico de un par (año, mes); los talleres sin año o sin mes van al final
+def _period_key(year, month):
+    year_key = int(year) if str(year).isdigit() else 9999
+    month_key = MONTH_ORDER.index(month) if month in MONTH_ORDER else 99
+    return year_key, month_key
+
+# Métricas de los talleres filtrados (posiciones dentro del modelo)
+def filter_metrics(metrics_table, positions):
+    return metrics_table[metrics_table["posicion"].isin(positions)]
+
+# Media, mediana y número de talleres por país para una métrica
+def metric_by_country(metrics, metric="Favorabilidad"):
+    values = metrics[metrics["metrica"] == metric].dropna(subset=["valor"])
+    return values.groupby("pais")["valor"].agg(["mean", "median", "count"]).reset_index()
+
+# Añadir el nombre del periodo (mes y año) y ordenar cronológicamente
+def _sort_by_period(trend):
+    trend["orden"] = [_period_key(year, month) for year, month in zip(trend["año"], trend["mes"])]
+    trend["periodo"] = [
+        month if year == "Sin año" else f"{month} {year}"
+        for year, month in zip(trend["año"], trend["mes"])
+    ]
+    return trend.sort_values("orden")
+
+# Media mensual de cada métrica, en orden cronológico
+def monthly_trend(metrics):
+    trend = metrics.dropna(subset=["valor"]).groupby(["año", "mes", "metrica"])["valor"].mean().reset_index()
+    return _sort_by_period(trend)
+
+# Una fila por facilitador y taller para ver la distribución de una métrica
+def metric_by_facilitator(metrics, metric="Favorabilidad"):
+    values = metrics[metrics["metrica"] == metric].dropna(subset=["valor"])
+    return values.explode("facilitadores").dropna(subset=["facilitadores"])
+
+# Panel de indicadores de los talleres filtrados
+def render_dashboard(metrics):
+    if metrics["valor"].notna().sum() == 0:
+        st.info("No hay resultados numéricos de encuesta para los talleres seleccionados")
+        return
+    
+    # Indicadores principales
+    averages = metrics.groupby("metrica")["valor"].mean()
+    kpi_cols = st.columns(len(SURVEY_METRICS) + 1)
+    kpi_cols[0].metric("Talleres", metrics["posicion"].nunique())
+    for col, metric in zip(kpi_cols[1:], SURVEY_METRICS):
+        value = averages.get(metric)
+        col.metric(f"{metric} media", "-" if pd.isna(value) else f"{value:.1f}%")
+    
+    chart_col1, chart_col2 = st.columns(2)
+    
+    # Favorabilidad por país
+    with chart_col1:
+        by_country = metric_by_country(metrics)
+        fig = go.Figure([
+            go.Bar(name="Media", x=by_country["pais"], y=by_country["mean"]),
+            go.Bar(name="Mediana", x=by_country["pais"], y=by_country["median"])
+        ])
+        fig.update_layout(title="Favorabilidad por país", barmode="group", yaxis_title="%")
+        st.plotly_chart(fig)
+    
+    # Evolución mensual
+    with chart_col2:
+        trend = monthly_trend(metrics)
+        fig = go.Figure([
+            go.Scatter(name=metric, x=values["periodo"], y=values["valor"], mode="lines+markers")
+            for metric, values in trend.groupby("metrica", sort=False)
+        ])
+        fig.update_layout(title="Evolución mensual", yaxis_title="%")
+        fig.update_xaxes(categoryorder="array", categoryarray=list(dict.fromkeys(trend["periodo"])))
+        st.plotly_chart(fig)
+    
+    # Distribución por facilitador
+    by_facilitator = metric_by_facilitator(metrics)
+    if not by_facilitator.empty:
+        fig = go.Figure([
+            go.Box(name=facilitator, y=values["valor"], boxpoints="all")
+            for facilitator, values in by_facilitator.groupby("facilitadores")
+        ])
+        fig.update_layout(title="Favorabilidad por facilitador", yaxis_title="%", showlegend=False)
+        st.plotly_chart(fig)
+
+# Análisis por facilitador a partir de sus acumulados (FacilitatorRollups)
+def render_facilitator_analytics(rollups, scope):
+    if not rollups.workshops:
+        st.info("No hay facilitadores en los talleres seleccionados")
+        return
+    st.caption(scope)
+    
+    # Axialent frente a externos
+    st.dataframe(rollups.split(), hide_index=True)
+    
+    # Ranking de facilitadores
+    filter_col1, filter_col2 = st.columns(2)
+    with filter_col1:
+        kind = st.radio("Facilitadores:", ["Todos", AXIALENT, EXTERNAL], horizontal=True)
+    with filter_col2:
+        min_workshops = st.number_input("Mínimo de talleres:", min_value=1, value=1)
+    leaderboard = rollups.leaderboard(None if kind == "Todos" else kind, min_workshops)
+    st.dataframe(leaderboard, hide_index=True)
+    
+    # Evolución del Response Rate de los facilitadores elegidos
+    names = leaderboard.sort_values("talleres", ascending=False)["facilitador"].tolist()
+    selected = st.multiselect("Evolución del Response Rate de:", names, default=names[:5])
+    if selected:
+        trend = _sort_by_period(rollups.trend("Response Rate", set(selected)))
+        fig = go.Figure([
+            go.Scatter(name=name, x=values["periodo"], y=values["valor"], mode="lines+markers")
+            for name, values in trend.groupby("facilitador", sort=False)
+        ])
+        fig.update_layout(title="Response Rate por facilitador", yaxis_title="%")
+        fig.update_xaxes(categoryorder="array", categoryarray=list(dict.fromkeys(trend["periodo"])))
+        st.plotly_chart(fig)
+    
+    # Co-facilitación
+    pairs = rollups.top_pairs()
+    if not pairs.empty:
+        st.write("Parejas que más talleres comparten:")
+        st.dataframe(pairs, hide_index=True)
@@ -0,0 +1,56 @@
+import csv
+import io
+import tempfile
+import zipfile
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+from workshop_parser import build_tables
+
+EXPORT_MIME_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "zip": "application/zip"
+}
+
+# Valor de una celda listo para escribir: sin NaN ni caracteres que Excel no admite
+def _export_value(value):
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", value)
+    if value is None or pd.isna(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+# Filas de una tabla como tuplas de valores de Python
+def _table_rows(table):
+    for row in table.itertuples(index=False, name=None):
+        yield tuple(_export_value(value) for value in row)
+
+# Libro XLSX con una hoja por tabla, a partir del modelo ya extraído. El escritor en modo write-only
+# va volcando las filas a disco en lugar de mantener todas las celdas en memoria.
+def export_xlsx(workshops, source=""):
+    workbook = Workbook(write_only=True)
+    for name, table in build_tables(workshops, source).items():
+        worksheet = workbook.create_sheet(title=name)
+        worksheet.append(list(table.columns))
+        for row in _table_rows(table):
+            worksheet.append(row)
+    
+    output = tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024)
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+# ZIP con un CSV por tabla (UTF-8 con BOM para que Excel respete los acentos)
+def export_csv_zip(workshops, source=""):
+    output = tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024)
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, table in build_tables(workshops, source).items():
+            with archive.open(f"{name}.csv", "w") as member:
+                with io.TextIOWrapper(member, encoding="utf-8-sig", newline="") as text:
+                    writer = csv.writer(text)
+                    writer.writerow(table.columns)
+                    writer.writerows(_table_rows(table))
+    output.seek(0)
+    return output
@@ -0,0 +1,120 @@
+import argparse
+import glob
+import importlib.util
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from ingest_profile import IngestProfile
+from parse_cache import SheetCache
+from workshop_parser import build_tables, parse_workbook
+
+logger = logging.getLogger("extract_workbooks")
+
+# Formatos de salida y cómo escribir cada tabla
+OUTPUT_FORMATS = {
+    "parquet": lambda table, path: table.to_parquet(path, index=False),
+    "csv": lambda table, path: table.to_csv(path, index=False),
+    "json": lambda table, path: table.to_json(path, orient="records", lines=True, force_ascii=False)
+}
+
+# Extensiones de archivo de cada formato
+OUTPUT_EXTENSIONS = {"parquet": ".parquet", "csv": ".csv", "json": ".jsonl"}
+
+# Procesar un archivo Excel completo (se ejecuta en un proceso del pool).
+# source identifica el archivo en la columna "archivo" (ruta relativa al directorio de entrada).
+# Devuelve (ruta, tablas normalizadas, errores por hoja, perfil) o (ruta, None, error, None) si el
+# archivo falla. El perfil se registra en el proceso principal, que es el que configura logging.
+def extract_file(path, cache_dir=None, source=None):
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        cache = SheetCache(cache_dir) if cache_dir else None
+        profile = IngestProfile(path)
+        workshops = []
+        errors = []
+        for sheet_name, workshop, error in parse_workbook(data, cache=cache, profile=profile):
+            if error is not None:
+                errors.append((sheet_name, error))
+            elif workshop is not None:
+                workshops.append(workshop)
+                errors.extend((sheet_name, message) for message in workshop.errores)
+        profile.finish()
+        return path, build_tables(workshops, source=source or os.path.basename(path)), errors, profile
+    except Exception as e:
+        return path, None, str(e), None
+
+# Archivos Excel de un directorio, en orden alfabético
+def find_workbooks(directory, recursive=False):
+    pattern = os.path.join(directory, "**", "*") if recursive else os.path.join(directory, "*")
+    return sorted(
+        path for path in glob.glob(pattern, recursive=recursive)
+        if path.lower().endswith((".xlsx", ".xls")) and not os.path.basename(path).startswith("~$")
+    )
+
+# Procesar todos los archivos en paralelo y escribir una tabla por tipo de dato
+def extract_directory(directory, output_dir, output_format="parquet", workers=None, cache_dir=None, recursive=False):
+    paths = find_workbooks(directory, recursive)
+    if not paths:
+        logger.warning("No se encontraron archivos Excel en %s", directory)
+    
+    tables = {}
+    failed = []
+    workers = workers or os.cpu_count() or 1
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        sources = [os.path.relpath(path, directory) for path in paths]
+        for path, file_tables, errors, profile in pool.map(extract_file, paths, [cache_dir] * len(paths), sources):
+            if profile is not None:
+                profile.log()
+            if file_tables is None:
+                logger.error("Error al procesar %s: %s", path, errors)
+                failed.append(path)
+                continue
+            for sheet_name, error in errors:
+                logger.warning("Error al analizar la hoja '%s' de %s: %s", sheet_name, path, error)
+            logger.info("%s: %d talleres", path, len(file_tables["talleres"]))
+            for name, table in file_tables.items():
+                tables.setdefault(name, []).append(table)
+    
+    os.makedirs(output_dir, exist_ok=True)
+    written = {}
+    for name, parts in tables.items():
+        parts = [part for part in parts if not part.empty] or parts[:1]
+        table = pd.concat(parts, ignore_index=True)
+        path = os.path.join(output_dir, name + OUTPUT_EXTENSIONS[output_format])
+        OUTPUT_FORMATS[output_format](table, path)
+        written[name] = (path, len(table))
+    return written, failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Extrae los talleres de un directorio de archivos Excel a tablas normalizadas"
+    )
+    parser.add_argument("input_dir", help="Directorio con los archivos Excel")
+    parser.add_argument("-o", "--output-dir", default="salida", help="Directorio de salida (por defecto: salida)")
+    parser.add_argument("-f", "--format", choices=sorted(OUTPUT_FORMATS), default="parquet", help="Formato de salida")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Procesos en paralelo (por defecto: uno por CPU)")
+    parser.add_argument("--cache-dir", default=None, help="Directorio de la caché de hojas para ejecuciones incrementales")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Buscar archivos también en subdirectorios")
+    args = parser.parse_args(argv)
+    # Parquet necesita pyarrow o fastparquet: avisar antes de procesar todos los archivos
+    if args.format == "parquet" and not any(
+        importlib.util.find_spec(engine) for engine in ("pyarrow", "fastparquet")
+    ):
+        parser.error("el formato parquet requiere pyarrow (pip install pyarrow); use -f csv o -f json")
+    
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    written, failed = extract_directory(
+        args.input_dir, args.output_dir, args.format, args.workers, args.cache_dir, args.recursive
+    )
+    for name, (path, rows) in written.items():
+        logger.info("%s: %d filas en %s", name, rows, path)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from workshop_parser import SURVEY_METRICS
+
+# Tipos de facilitador según la empresa que figura en el taller
+AXIALENT = "Axialent"
+EXTERNAL = "Externo"
+
+# Histograma de 0 a 100 en saltos de 1 punto: basta para percentiles y se puede sumar
+HISTOGRAM_BINS = 101
+
+# Facilitadores de un taller: {nombre: 1 si figura como Axialent en el taller, si no 0}.
+# El tipo se decide sobre todos los talleres: quien figura alguna vez como Axialent
+# cuenta como Axialent (igual que el filtro de facilitadores Axialent).
+def workshop_facilitators(workshop):
+    facilitators = {}
+    for facilitator in workshop.facilitadores:
+        facilitators[facilitator.name] = max(facilitators.get(facilitator.name, 0), int(facilitator.is_axialent))
+    return facilitators
+
+# Incrementos que aporta un taller a los acumulados por facilitador.
+# Son sumas, así que agregar talleres nuevos solo requiere sumar sus incrementos.
+def rollup_increments(workshop):
+    facilitators = workshop_facilitators(workshop)
+    metrics = [
+        (metric, float(value)) for metric, value in zip(SURVEY_METRICS, workshop.metric_values)
+        if value == value
+    ]
+    return {
+        "talleres": list(facilitators.items()),
+        "estadisticas": [(name, metric, value) for name in facilitators for metric, value in metrics],
+        "histograma": [(name, metric, histogram_bin(value)) for name in facilitators for metric, value in metrics],
+        "periodos": [
+            (name, workshop.year, workshop.month, metric, value)
+            for name in facilitators
+            for metric, value in metrics
+        ],
+        "pares": list(itertools.combinations(sorted(facilitators), 2))
+    }
+
+# Intervalo del histograma de un valor en porcentaje
+def histogram_bin(value):
+    return min(max(int(round(value)), 0), HISTOGRAM_BINS - 1)
+
+# Percentil (0-100) a partir de un histograma de conteos
+def histogram_percentile(histogram, q):
+    total = histogram.sum()
+    if total == 0:
+        return np.nan
+    return float(np.searchsorted(np.cumsum(histogram), q / 100 * total))
+
+# Acumulados por facilitador: talleres, suma y conteo de cada métrica, histogramas,
+# evolución por periodo y pares de co-facilitación. Se construyen taller a taller
+# o desde las tablas ya acumuladas del histórico.
+class FacilitatorRollups:
+    def __init__(self):
+        self.workshops = {}  # nombre: talleres
+        self.axialent = {}  # nombre: talleres en los que figura como Axialent
+        self.stats = {}  # (nombre, métrica): [conteo, suma]
+        self.histograms = {}  # (nombre, métrica): conteos por punto porcentual
+        self.periods = {}  # (nombre, año, mes, métrica): [conteo, suma]
+        self.pairs = {}  # (nombre, nombre): talleres juntos
+
+    # Sumar un taller
+    def add(self, workshop):
+        self.apply(rollup_increments(workshop))
+        return self
+
+    # Sumar los incrementos de un taller (los mismos que se guardan en el histórico)
+    def apply(self, increments):
+        for name, axialent in increments["talleres"]:
+            self.workshops[name] = self.workshops.get(name, 0) + 1
+            self.axialent[name] = self.axialent.get(name, 0) + axialent
+        for name, metric, value in increments["estadisticas"]:
+            stat = self.stats.setdefault((name, metric), [0, 0.0])
+            stat[0] += 1
+            stat[1] += value
+        for name, metric, bin_index in increments["histograma"]:
+            self.add_histogram((name, metric), bin_index, 1)
+        for name, year, month, metric, value in increments["periodos"]:
+            period = self.periods.setdefault((name, year, month, metric), [0, 0.0])
+            period[0] += 1
+            period[1] += value
+        for pair in increments["pares"]:
+            self.pairs[pair] = self.pairs.get(pair, 0) + 1
+
+    def add_histogram(self, key, bin_index, count):
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+        histogram[bin_index] += count
+
+    # Tipo de un facilitador: Axialent si figura como Axialent en algún taller
+    def kind(self, name):
+        return AXIALENT if self.axialent.get(name, 0) > 0 else EXTERNAL
+
+    # Ranking de facilitadores: talleres, media y percentiles de cada métrica
+    def leaderboard(self, kind=None, min_workshops=1):
+        rows = []
+        for name, count in self.workshops.items():
+            facilitator_kind = self.kind(name)
+            if (kind and facilitator_kind != kind) or count < min_workshops:
+                continue
+            row = {"facilitador": name, "tipo": facilitator_kind, "talleres": count}
+            for metric in SURVEY_METRICS:
+                n, total = self.stats.get((name, metric), (0, 0.0))
+                row[f"{metric} media"] = total / n if n else np.nan
+                if metric != "Response Rate":
+                    histogram = self.histograms.get((name, metric), np.zeros(HISTOGRAM_BINS))
+                    for q in (25, 50, 75):
+                        row[f"{metric} p{q}"] = histogram_percentile(histogram, q)
+            rows.append(row)
+        columns = ["facilitador", "tipo", "talleres"] + [
+            f"{metric} {stat}" for metric in SURVEY_METRICS
+            for stat in (["media"] if metric == "Response Rate" else ["media", "p25", "p50", "p75"])
+        ]
+        table = pd.DataFrame(rows, columns=columns)
+        return table.sort_values(["Favorabilidad media", "talleres"], ascending=False, na_position="last")
+
+    # Comparación Axialent / externos (cada par facilitador-taller cuenta una vez)
+    def split(self):
+        rows = {}
+        for name, count in self.workshops.items():
+            kind = self.kind(name)
+            row = rows.setdefault(kind, {"tipo": kind, "facilitadores": 0, "participaciones": 0})
+            row["facilitadores"] += 1
+            row["participaciones"] += count
+        sums = {}
+        for (name, metric), (n, total) in self.stats.items():
+            acc = sums.setdefault((self.kind(name), metric), [0, 0.0])
+            acc[0] += n
+            acc[1] += total
+        for (kind, metric), (n, total) in sums.items():
+            rows[kind][f"{metric} media"] = total / n if n else np.nan
+        return pd.DataFrame(
+            list(rows.values()),
+            columns=["tipo", "facilitadores", "participaciones", *[f"{metric} media" for metric in SURVEY_METRICS]]
+        )
+
+    # Media de una métrica por periodo (año, mes) para cada facilitador
+    def trend(self, metric="Response Rate", names=None):
+        rows = [
+            {"facilitador": name, "año": year, "mes": month, "conteo": n, "suma": total}
+            for (name, year, month, period_metric), (n, total) in self.periods.items()
+            if period_metric == metric and (names is None or name in names)
+        ]
+        table = pd.DataFrame(rows, columns=["facilitador", "año", "mes", "conteo", "suma"])
+        table["valor"] = table["suma"] / table["conteo"]
+        return table.drop(columns=["suma"])
+
+    # Pares de facilitadores que más talleres comparten
+    def top_pairs(self, limit=20):
+        table = pd.DataFrame(
+            [(a, b, count) for (a, b), count in self.pairs.items()],
+            columns=["facilitador", "co-facilitador", "talleres"]
+        )
+        return table.sort_values("talleres", ascending=False).head(limit)
+
+# Acumulados de una lista de talleres (por ejemplo, la selección filtrada)
+def build_rollups(workshops):
+    rollups = FacilitatorRollups()
+    for workshop in workshops:
+        rollups.add(workshop)
+    return rollups
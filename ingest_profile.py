@@ -0,0 +1,120 @@
+import contextlib
+import json
+import logging
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # resource solo existe en Unix; en Windows no se informa la memoria máxima
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Archivo opcional donde añadir cada perfil como una línea JSON (ENCUESTAS_PROFILE_LOG)
+PROFILE_LOG_PATH = os.environ.get("ENCUESTAS_PROFILE_LOG")
+
+# Los dibujados de la app solo se registran si tardan al menos estos segundos
+# (ENCUESTAS_SLOW_RENDER_S); los demás solo se ven en el panel de rendimiento
+SLOW_RENDER_SECONDS = float(os.environ.get("ENCUESTAS_SLOW_RENDER_S", 2))
+
+# Memoria residente máxima (en MB) del proceso y de sus procesos hijos terminados
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return {"proceso": own, "hijos": children}
+
+# Perfil de una carga (o de un dibujado de la app): tiempo por etapa, tiempo y filas por hoja, aciertos de caché y memoria
+class IngestProfile:
+    def __init__(self, name="", event="carga"):
+        self.name = name
+        self.event = event
+        self.stages = {}
+        self.sheets = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.started = time.time()
+        self.total = None
+        self.peak_rss = None
+
+    # Medir una etapa (se acumula si la etapa se repite, por ejemplo en cada hoja)
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    # Registrar el resultado de una hoja
+    def add_sheet(self, sheet_name, seconds, rows, workshop=False, error=None, cached=False):
+        self.sheets.append({
+            "hoja": sheet_name,
+            "segundos": seconds,
+            "filas": rows,
+            "taller": workshop,
+            "error": error,
+            "origen": "caché" if cached else "procesada"
+        })
+
+    # Sumar el perfil de un proceso del pool
+    def merge(self, other):
+        for name, seconds in other.stages.items():
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+        self.sheets.extend(other.sheets)
+
+    # Cerrar el perfil con el tiempo total y la memoria máxima
+    def finish(self):
+        self.total = time.time() - self.started
+        self.peak_rss = peak_rss_mb()
+        return self
+
+    # Hojas más lentas primero
+    def slowest_sheets(self, limit=10):
+        return sorted(self.sheets, key=lambda sheet: sheet["segundos"], reverse=True)[:limit]
+
+    def to_dict(self):
+        return {
+            "evento": self.event,
+            "archivo": self.name,
+            "inicio": self.started,
+            "total_s": self.total,
+            "etapas_s": self.stages,
+            "hojas": len(self.sheets),
+            "filas": sum(sheet["filas"] for sheet in self.sheets),
+            "cache_aciertos": self.cache_hits,
+            "cache_fallos": self.cache_misses,
+            "rss_max_mb": self.peak_rss,
+            "hojas_lentas": self.slowest_sheets()
+        }
+
+    # Escribir el perfil como JSON estructurado en el log (y en PROFILE_LOG_PATH si está definido)
+    def log(self):
+        line = json.dumps(self.to_dict(), ensure_ascii=False)
+        logger.info(line)
+        if PROFILE_LOG_PATH:
+            try:
+                with open(PROFILE_LOG_PATH, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                logger.warning("No se pudo escribir el perfil en %s: %s", PROFILE_LOG_PATH, e)
+
+# Mostrar los perfiles en la consola cuando nadie configura logging (la app de Streamlit
+# solo configura sus propios loggers). Se puede llamar en cada ejecución del script.
+def enable_profile_logging(level=logging.INFO):
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(level)
+
+# Etapa medida si hay perfil, o un contexto vacío si no lo hay
+def profile_stage(profile, name):
+    return profile.stage(name) if profile is not None else contextlib.nullcontext()
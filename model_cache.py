@@ -0,0 +1,114 @@
+import os
+import pickle
+import threading
+import time
+
+# Memoria máxima y tiempo sin uso antes de descartar un modelo
+# (configurables con ENCUESTAS_MODEL_CACHE_MB y ENCUESTAS_MODEL_CACHE_TTL)
+DEFAULT_MODEL_CACHE_MB = float(os.environ.get("ENCUESTAS_MODEL_CACHE_MB", 1024))
+DEFAULT_MODEL_CACHE_TTL = float(os.environ.get("ENCUESTAS_MODEL_CACHE_TTL", 3600))
+
+# Tamaño aproximado (en bytes) de un WorkbookModel: talleres, tabla de métricas e índice de verbatims
+def estimate_model_size(model):
+    size = len(pickle.dumps(model.workshops, protocol=pickle.HIGHEST_PROTOCOL))
+    size += int(model.metrics_table.memory_usage(deep=True).sum())
+    index = model.verbatim_index
+    size += sum(value.nbytes for value in vars(index).values() if hasattr(value, "nbytes"))
+    size += sum(len(text) for text in index.texts)
+    return size
+
+# Entrada de la caché: el valor cargado, su tamaño y el último uso
+class _Entry:
+    __slots__ = ("value", "size", "last_used")
+
+    def __init__(self, value, size):
+        self.value = value
+        self.size = size
+        self.last_used = time.monotonic()
+
+# Caché de modelos compartida por todas las sesiones del proceso, indexada por el
+# hash del contenido. Si varias sesiones piden el mismo archivo a la vez, solo la
+# primera lo procesa y las demás esperan su resultado (un bloqueo por clave).
+# Descarta los modelos sin uso durante ttl segundos y, si se supera la memoria
+# máxima, los usados hace más tiempo.
+class ModelCache:
+    def __init__(self, max_mb=DEFAULT_MODEL_CACHE_MB, ttl=DEFAULT_MODEL_CACHE_TTL, sizer=estimate_model_size):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl = ttl
+        self.sizer = sizer
+        self._entries = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    # Devolver el valor de la clave, cargándolo con loader() si no está en la caché
+    def get_or_load(self, key, loader):
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.last_used = time.monotonic()
+                self.hits += 1
+                return entry.value
+            key_lock = self._loading.get(key)
+            if key_lock is None:
+                key_lock = self._loading[key] = threading.Lock()
+            else:
+                self.coalesced += 1
+        
+        with key_lock:
+            # Otra sesión pudo terminar la carga mientras esperábamos el bloqueo
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.last_used = time.monotonic()
+                    return entry.value
+            try:
+                value = loader()
+                size = self.sizer(value)
+                with self._lock:
+                    self.misses += 1
+                    self._entries[key] = _Entry(value, size)
+                    self._evict(keep=key)
+                return value
+            finally:
+                with self._lock:
+                    if self._loading.get(key) is key_lock:
+                        del self._loading[key]
+
+    # Descartar los modelos que llevan más de ttl segundos sin usarse
+    def _expire(self):
+        if self.ttl is None or self.ttl <= 0:
+            return
+        limit = time.monotonic() - self.ttl
+        for key in [key for key, entry in self._entries.items() if entry.last_used < limit]:
+            del self._entries[key]
+
+    # Descartar los modelos usados hace más tiempo hasta respetar la memoria máxima.
+    # El modelo recién cargado se conserva aunque por sí solo la supere.
+    def _evict(self, keep=None):
+        total = sum(entry.size for entry in self._entries.values())
+        for key in sorted(self._entries, key=lambda key: self._entries[key].last_used):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._entries.pop(key).size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # (modelos en caché, bytes estimados, aciertos, cargas, esperas compartidas)
+    def stats(self):
+        with self._lock:
+            self._expire()
+            return (
+                len(self._entries),
+                sum(entry.size for entry in self._entries.values()),
+                self.hits,
+                self.misses,
+                self.coalesced
+            )
@@ -0,0 +1,106 @@
+import os
+import pickle
+import sqlite3
+import time
+
+# Directorio de la caché (configurable en el servidor con ENCUESTAS_CACHE_DIR)
+DEFAULT_CACHE_DIR = os.environ.get(
+    "ENCUESTAS_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "encuestas-satisfaccion")
+)
+
+# Tamaño máximo por defecto de la caché en disco
+DEFAULT_MAX_MB = 256
+
+# Caché en disco de hojas ya extraídas, indexada por la huella de cada hoja.
+# Guarda el Workshop de cada hoja (o None si la hoja no es de taller) en SQLite
+# y descarta las entradas usadas hace más tiempo cuando se supera el tamaño máximo.
+class SheetCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_mb=DEFAULT_MAX_MB):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.path = os.path.join(directory, "sheets.sqlite")
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sheets ("
+                " fingerprint TEXT PRIMARY KEY,"
+                " payload BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sheets_last_used ON sheets (last_used)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    # Buscar varias huellas a la vez; devuelve {huella: Workshop o None}
+    def get_many(self, fingerprints):
+        fingerprints = list(fingerprints)
+        found = {}
+        with self._connect() as conn:
+            # SQLite limita el número de parámetros por consulta
+            for i in range(0, len(fingerprints), 500):
+                chunk = fingerprints[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT fingerprint, payload FROM sheets WHERE fingerprint IN ({placeholders})",
+                    chunk
+                ).fetchall()
+                for fingerprint, payload in rows:
+                    try:
+                        found[fingerprint] = pickle.loads(payload)
+                    except Exception:
+                        # Entrada corrupta o de una versión anterior: se vuelve a procesar
+                        continue
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE sheets SET last_used = ? WHERE fingerprint = ?",
+                    [(now, fingerprint) for fingerprint in found]
+                )
+        return found
+
+    # Guardar {huella: Workshop o None} y aplicar el límite de tamaño
+    def put_many(self, entries):
+        if not entries:
+            return
+        now = time.time()
+        rows = []
+        for fingerprint, workshop in entries.items():
+            payload = pickle.dumps(workshop, protocol=pickle.HIGHEST_PROTOCOL)
+            rows.append((fingerprint, payload, len(payload), now))
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO sheets (fingerprint, payload, size, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._evict(conn)
+
+    # Eliminar las entradas menos usadas hasta quedar por debajo del tamaño máximo
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM sheets").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        to_delete = []
+        for fingerprint, size in conn.execute("SELECT fingerprint, size FROM sheets ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            to_delete.append((fingerprint,))
+            total -= size
+        conn.executemany("DELETE FROM sheets WHERE fingerprint = ?", to_delete)
+
+    # Número de entradas y tamaño total en bytes
+    def stats(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sheets").fetchone()
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sheets")
+        # Liberar el espacio del archivo
+        conn = self._connect()
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
@@ -0,0 +1,242 @@
+import functools
+import io
+import multiprocessing
+import re
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from xml.sax.saxutils import escape
+
+import numpy as np
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from workshop_parser import SURVEY_METRICS
+
+# Registrar las fuentes una sola vez por proceso (Vera viene con reportlab y tiene acentos)
+@functools.lru_cache(maxsize=None)
+def register_fonts():
+    try:
+        pdfmetrics.registerFont(TTFont("Vera", "Vera.ttf"))
+        pdfmetrics.registerFont(TTFont("VeraBd", "VeraBd.ttf"))
+        return "Vera", "VeraBd"
+    except Exception:
+        return "Helvetica", "Helvetica-Bold"
+
+# Estilos de párrafo, creados una sola vez por proceso
+@functools.lru_cache(maxsize=None)
+def get_styles():
+    regular, bold = register_fonts()
+    base = getSampleStyleSheet()
+    return {
+        "title": ParagraphStyle("Titulo", parent=base["Title"], fontName=bold, fontSize=16),
+        "heading": ParagraphStyle("Seccion", parent=base["Heading2"], fontName=bold, fontSize=12),
+        "body": ParagraphStyle("Texto", parent=base["BodyText"], fontName=regular, fontSize=9, leading=12)
+    }
+
+# Gráfico de barras (0-100 %), cacheado por sus datos para no regenerarlo en cada página
+@functools.lru_cache(maxsize=256)
+def bar_chart(title, labels, values, width=16 * cm, height=6 * cm):
+    regular, bold = register_fonts()
+    drawing = Drawing(width, height)
+    chart = VerticalBarChart()
+    chart.x = 1.2 * cm
+    chart.y = 1.2 * cm
+    chart.width = width - 2 * cm
+    chart.height = height - 2.2 * cm
+    chart.data = [[0 if np.isnan(value) else value for value in values]]
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.valueMax = 100
+    chart.valueAxis.valueStep = 20
+    chart.valueAxis.labels.fontName = regular
+    chart.categoryAxis.categoryNames = [label[:18] for label in labels]
+    chart.categoryAxis.labels.fontName = regular
+    chart.categoryAxis.labels.fontSize = 7
+    if len(labels) > 6:
+        chart.categoryAxis.labels.angle = 30
+        chart.categoryAxis.labels.boxAnchor = "ne"
+    chart.bars[0].fillColor = colors.HexColor("#1f77b4")
+    drawing.add(chart)
+    drawing.add(String(0, height - 0.5 * cm, title, fontName=bold, fontSize=10))
+    return drawing
+
+# Formato de un valor en porcentaje para las tablas
+def _percent(value):
+    return "-" if value is None or np.isnan(value) else f"{value:.1f}%"
+
+# Tabla con la primera fila como encabezado
+def _table(rows, col_widths=None):
+    regular, bold = register_fonts()
+    table = Table(rows, colWidths=col_widths, repeatRows=1)
+    table.setStyle(TableStyle([
+        ("FONTNAME", (0, 0), (-1, -1), regular),
+        ("FONTNAME", (0, 0), (-1, 0), bold),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#e8eef7")),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("VALIGN", (0, 0), (-1, -1), "TOP")
+    ]))
+    return table
+
+# Escribir los elementos en un PDF A4 y devolver sus bytes
+def _build_pdf(story, title):
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, title=title,
+                            leftMargin=2 * cm, rightMargin=2 * cm, topMargin=1.5 * cm, bottomMargin=1.5 * cm)
+    doc.build(story)
+    return buffer.getvalue()
+
+# Informe de un taller: métricas, facilitadores, fishbowl y verbatims
+def render_workshop_pdf(workshop):
+    styles = get_styles()
+    values = workshop.metric_values
+    story = [
+        Paragraph(escape(workshop.sheet_name), styles["title"]),
+        Paragraph(escape(f"País: {workshop.country} · Mes: {workshop.month} · Año: {workshop.year}"), styles["body"]),
+        Spacer(1, 0.4 * cm),
+        Paragraph("Resultados de Encuesta", styles["heading"]),
+        _table([["Métrica", "Valor"]] + [[metric, _percent(value)] for metric, value in zip(SURVEY_METRICS, values)]),
+        Spacer(1, 0.3 * cm),
+        bar_chart("Resultados de la encuesta (%)", tuple(SURVEY_METRICS), values),
+        Paragraph("Facilitadores", styles["heading"])
+    ]
+    if workshop.facilitadores:
+        story.append(_table([["Nombre", "Empresa"]] + [
+            [facilitator.name, facilitator.company]
+            for facilitator in workshop.facilitadores
+        ]))
+    else:
+        story.append(Paragraph("No se encontraron datos de facilitadores", styles["body"]))
+    
+    story.append(Paragraph("Fishbowl", styles["heading"]))
+    if workshop.fishbowl:
+        story.append(Paragraph(escape(", ".join(workshop.fishbowl)), styles["body"]))
+    else:
+        story.append(Paragraph("No se encontraron datos de fishbowl", styles["body"]))
+    
+    story.append(Paragraph("Verbatims", styles["heading"]))
+    if workshop.verbatims:
+        story.extend(
+            Paragraph(f"<b>{j+1}.</b> {escape(verbatim)}", styles["body"])
+            for j, verbatim in enumerate(workshop.verbatims)
+        )
+    else:
+        story.append(Paragraph("No se encontraron verbatims", styles["body"]))
+    return _build_pdf(story, workshop.sheet_name)
+
+# Informe consolidado de un grupo de talleres (un país o un facilitador)
+def render_summary_pdf(title, workshops):
+    styles = get_styles()
+    matrix = np.array([workshop.metric_values for workshop in workshops], dtype=float).reshape(-1, len(SURVEY_METRICS))
+    # Media sin NaN calculada a mano: nanmean avisa de cada métrica sin valores
+    counts = np.count_nonzero(~np.isnan(matrix), axis=0)
+    means = np.where(counts > 0, np.nansum(matrix, axis=0) / np.maximum(counts, 1), np.nan)
+    
+    story = [
+        Paragraph(escape(title), styles["title"]),
+        Paragraph(f"{len(workshops)} talleres", styles["body"]),
+        Spacer(1, 0.4 * cm),
+        Paragraph("Promedios", styles["heading"]),
+        _table([["Métrica", "Media"]] + [[metric, _percent(value)] for metric, value in zip(SURVEY_METRICS, means)]),
+        Spacer(1, 0.3 * cm),
+        bar_chart("Promedios (%)", tuple(SURVEY_METRICS), tuple(means)),
+        bar_chart(
+            "Favorabilidad por taller (%)",
+            tuple(workshop.sheet_name for workshop in workshops[:30]),
+            tuple(matrix[:30, 0]) if len(workshops) else ()
+        ),
+        Paragraph("Talleres", styles["heading"]),
+        _table(
+            [["Taller", "País", "Mes"] + SURVEY_METRICS] + [
+                [Paragraph(escape(workshop.sheet_name), styles["body"]), workshop.country, workshop.month]
+                + [_percent(value) for value in row]
+                for workshop, row in zip(workshops, matrix)
+            ],
+            col_widths=[5.5 * cm, 1.5 * cm, 2 * cm, 2.5 * cm, 2.5 * cm, 2.5 * cm]
+        )
+    ]
+    return _build_pdf(story, title)
+
+# Nombre de archivo seguro a partir de un texto
+def safe_filename(name):
+    return re.sub(r"[^\w\- ]", "_", str(name)).strip() or "informe"
+
+# Rutas de archivo distintas dentro de una carpeta del ZIP: los nombres repetidos
+# (o que safe_filename deja iguales) llevan un contador, p. ej. "ARG Enero (2).pdf"
+def unique_filenames(folder, names):
+    used = set()
+    paths = []
+    for name in names:
+        base = safe_filename(name)
+        filename = base
+        counter = 1
+        while filename.lower() in used:
+            counter += 1
+            filename = f"{base} ({counter})"
+        used.add(filename.lower())
+        paths.append(f"{folder}/{filename}.pdf")
+    return paths
+
+# Trabajos de informe de una selección de talleres:
+# uno por taller, uno por país y uno por facilitador de Axialent
+def build_report_jobs(workshops):
+    jobs = [
+        (filename, "taller", workshop)
+        for filename, workshop in zip(unique_filenames("talleres", [w.sheet_name for w in workshops]), workshops)
+    ]
+    
+    by_country = {}
+    by_facilitator = {}
+    for workshop in workshops:
+        by_country.setdefault(workshop.country, []).append(workshop)
+        for facilitator in workshop.facilitadores:
+            if facilitator.is_axialent:
+                group = by_facilitator.setdefault(facilitator.name, [])
+                if not group or group[-1] is not workshop:
+                    group.append(workshop)
+    
+    for folder, groups in (("paises", by_country), ("facilitadores", by_facilitator)):
+        groups = sorted(groups.items())
+        jobs += [
+            (filename, "resumen", (f"Resumen {name}", group))
+            for filename, (name, group) in zip(unique_filenames(folder, [name for name, _ in groups]), groups)
+        ]
+    return jobs
+
+# Generar un informe (se ejecuta en un proceso del pool)
+def render_job(job):
+    filename, kind, payload = job
+    if kind == "taller":
+        return filename, render_workshop_pdf(payload)
+    return filename, render_summary_pdf(*payload)
+
+# Generar todos los informes y escribirlos en un ZIP a medida que se terminan.
+# El ZIP se guarda en un archivo temporal que pasa a disco si crece mucho.
+def generate_reports_zip(workshops, workers=1, progress=None):
+    jobs = build_report_jobs(workshops)
+    output = tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024)
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        if workers <= 1 or len(jobs) < 2:
+            results = map(render_job, jobs)
+            pool = None
+        else:
+            context = multiprocessing.get_context("spawn")
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            results = (future.result() for future in as_completed([pool.submit(render_job, job) for job in jobs]))
+        try:
+            for done, (filename, pdf) in enumerate(results, start=1):
+                archive.writestr(filename, pdf)
+                if progress is not None:
+                    progress(done, len(jobs))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+    output.seek(0)
+    return output, len(jobs)
@@ -1,8 +1,26 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-import io
-import re
+import os
+import math
+import logging
+import dataclasses
+
+from workshop_parser import SURVEY_METRICS, build_workbook_model, format_metric, hash_workbook_bytes
+from dashboard import filter_metrics, render_dashboard, render_facilitator_analytics
+from facilitator_analytics import build_rollups
+from parse_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_MB, SheetCache
+from corpus_store import DEFAULT_CORPUS_PATH, CorpusStore
+from verbatim_search import highlight
+from verbatim_insights import InsightCache, VerbatimAnalyzer, group_hash, summarize_groups
+from pdf_reports import generate_reports_zip
+from data_export import EXPORT_MIME_TYPES, export_csv_zip, export_xlsx
+from ingest_profile import SLOW_RENDER_SECONDS, IngestProfile, enable_profile_logging
+from model_cache import ModelCache, estimate_model_size
+
+logger = logging.getLogger(__name__)
+
+# Los perfiles de carga se escriben en la consola del servidor
+enable_profile_logging()
 
 # Configuración de la página
 st.set_page_config(
@@ -11,337 +29,366 @@ st.set_page_config(
     layout="wide"
 )
 
-# Extraer país del nombre de la hoja
-def extract_country_from_sheet_name(sheet_name):
-    # Solo mantener los códigos de país que realmente usamos
-    country_codes = {
-        'BRA': 'Brasil',
-        'ARG': 'Argentina',
-        'MEX': 'México',
-        'CHL': 'Chile',
-        'COL': 'Colombia'
-    }
+# Caché de modelos compartida por todas las sesiones (una sola instancia por proceso)
+@st.cache_resource
+def get_model_cache():
+    return ModelCache(sizer=lambda loaded: estimate_model_size(loaded[0]))
+
+# Abrir el libro una sola vez y extraer todos los talleres. Si varias sesiones
+# cargan el mismo archivo, solo una lo procesa y el resto reutiliza el modelo
+# (el número de procesos no forma parte de la clave de la caché).
+# Devuelve también el perfil de la carga, que queda guardado junto al modelo.
+def load_workbook_model(content_hash, data, workers=1, cache=None, name=""):
+    def load():
+        profile = IngestProfile(name)
+        model = build_workbook_model(data, content_hash, workers, cache, profile)
+        # Acumulados por facilitador de todo el libro, una sola vez por carga
+        with profile.stage("acumulados"):
+            model = dataclasses.replace(model, rollups=build_rollups(model.workshops))
+        profile.finish().log()
+        return model, profile
+    return get_model_cache().get_or_load(content_hash, load)
+
+# Cargar el histórico (con los acumulados por facilitador guardados al agregar talleres);
+# la versión cambia al agregar talleres o vaciarlo e invalida la caché
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_corpus_model(path, version):
+    return CorpusStore(path).load_model()
+
+# Resumen corto de la encuesta para la cabecera de una tarjeta
+def workshop_summary(taller):
+    return " · ".join(
+        f"{metric}: {format_metric(value)}"
+        for metric, value in zip(SURVEY_METRICS, taller.metric_values)
+        if format_metric(value)
+    )
+
+# Contenido completo de una tarjeta (tablas y verbatims); solo se dibuja al abrirla
+def render_workshop_details(taller):
+    # 1. MOSTRAR RESULTADOS DE ENCUESTA
+    st.subheader("Resultados de Encuesta")
+    # Mostrar como tabla sin crear gráfico (la tabla se arma solo al abrir la tarjeta)
+    st.dataframe(
+        pd.DataFrame({"Métrica": SURVEY_METRICS, "Valor": [format_metric(value) for value in taller.metric_values]}),
+        hide_index=True
+    )
+    
+    # 2. MOSTRAR FACILITADORES
+    st.subheader("Facilitadores")
+    facilitadores = [
+        {"Nombre": facilitator.name, "Empresa": facilitator.company}
+        for facilitator in taller.facilitadores
+    ]
+    if facilitadores:
+        # Mostrar tabla sin índices
+        st.dataframe(pd.DataFrame(facilitadores), hide_index=True)
+    else:
+        st.info("No se encontraron datos de facilitadores")
     
-    for code in country_codes:
-        if code in sheet_name:
-            return code
+    # 3. MOSTRAR FISHBOWL
+    st.subheader("Fishbowl")
+    if taller.fishbowl:
+        # Solo mostrar nombre
+        st.dataframe(pd.DataFrame({"Nombre": taller.fishbowl}), hide_index=True)
+    else:
+        st.info("No se encontraron datos de fishbowl")
     
-    return "Otro"
+    # 4. MOSTRAR VERBATIMS
+    st.subheader("Verbatims")
+    if taller.verbatims:
+        # Mostrar verbatims en una lista numerada, en un solo bloque de markdown
+        st.markdown("\n".join(f"**{j+1}.** {verbatim}  " for j, verbatim in enumerate(taller.verbatims)))
+    else:
+        st.info("No se encontraron verbatims")
+
+# Nombre del grupo que reúne todos los verbatims de la selección actual
+SELECTION_GROUP = "Selección actual"
+
+# Clave de la API de Groq: variable de entorno o secrets de Streamlit
+def get_groq_api_key():
+    if os.environ.get("GROQ_API_KEY"):
+        return os.environ["GROQ_API_KEY"]
+    try:
+        return st.secrets.get("GROQ_API_KEY")
+    except Exception:
+        return None
 
-# Extraer mes del nombre de la hoja
-def extract_month_from_sheet_name(sheet_name):
-    # Lista de meses en español
-    months = {
-        "enero": "Enero",
-        "febrero": "Febrero",
-        "marzo": "Marzo",
-        "abril": "Abril",
-        "mayo": "Mayo",
-        "junio": "Junio",
-        "julio": "Julio",
-        "agosto": "Agosto",
-        "septiembre": "Septiembre",
-        "octubre": "Octubre",
-        "noviembre": "Noviembre",
-        "diciembre": "Diciembre"
-    }
+# Análisis de verbatims con IA: sentimiento y tema por comentario y resúmenes
+# por taller y de la selección; solo se ejecuta al pulsar el botón
+def render_verbatim_insights(workshops, cache_dir):
+    groups = {}
+    for taller in workshops:
+        if taller.verbatims:
+            groups.setdefault(taller.sheet_name, []).extend(taller.verbatims)
+    if not groups:
+        st.info("No hay verbatims en los talleres seleccionados")
+        return
     
-    # Buscar el mes en el nombre de la hoja
-    sheet_name_lower = sheet_name.lower()
-    for month_name, display_name in months.items():
-        if month_name in sheet_name_lower:
-            return display_name
+    all_verbatims = [verbatim for verbatims in groups.values() for verbatim in verbatims]
+    groups[SELECTION_GROUP] = all_verbatims
+    st.caption(f"{len(all_verbatims)} verbatims en {len(groups) - 1} talleres")
     
-    # Si no encontramos un mes por nombre, buscamos una fecha en formato DD/MM o similar
-    date_patterns = [
-        r"(\d{1,2})[\s/\-\.]+(\d{1,2})",  # 21/01, 21-01, 21.01
-        r"(\d{1,2})[\s]+de[\s]+(\w+)"     # 21 de enero
-    ]
+    api_key = get_groq_api_key()
+    if not api_key and not os.environ.get("GROQ_BASE_URL"):
+        st.info("Configura GROQ_API_KEY para analizar los verbatims con IA")
+        return
     
-    for pattern in date_patterns:
-        matches = re.findall(pattern, sheet_name_lower)
-        if matches:
-            # Intentar extraer mes de la fecha
+    # Los resultados se guardan por selección para no perderlos al interactuar con la app
+    selection_key = group_hash(all_verbatims) + str(len(groups))
+    if st.button("Analizar verbatims"):
+        with st.spinner("Analizando verbatims..."):
             try:
-                if len(matches[0]) > 1:
-                    # Si el patrón capturo grupos, el segundo puede ser el mes
-                    month_part = matches[0][1]
-                    # Si es numérico, convertir a nombre de mes
-                    if month_part.isdigit():
-                        month_num = int(month_part)
-                        if 1 <= month_num <= 12:
-                            month_names = list(months.values())
-                            return month_names[month_num - 1]
-                    # Si es texto, ver si coincide con un mes
-                    elif month_part in months:
-                        return months[month_part]
-            except:
-                pass
+                analyzer = VerbatimAnalyzer(api_key=api_key, cache=InsightCache(cache_dir))
+                results, summaries = analyzer.analyze_sync(groups)
+                st.session_state.verbatim_insights = (selection_key, summarize_groups(groups, results, summaries))
+            except Exception as e:
+                st.error(f"Error al analizar los verbatims: {str(e)}")
     
-    return "Sin mes específico"
+    stored = st.session_state.get("verbatim_insights")
+    if stored and stored[0] == selection_key:
+        rows = stored[1]
+        selection = rows[-1]
+        st.subheader(SELECTION_GROUP)
+        st.write(selection["resumen"] or "No se pudo generar el resumen")
+        st.caption(
+            f"Positivos: {selection['Positivo']} · Neutrales: {selection['Neutral']} · "
+            f"Negativos: {selection['Negativo']} · Temas: {selection['temas']}"
+        )
+        st.subheader("Por taller")
+        st.dataframe(pd.DataFrame(rows[:-1]), hide_index=True)
 
-# Función para verificar si una hoja tiene formato de taller
-def is_workshop_sheet(df, sheet_name):
-    # Excluir explícitamente la hoja "Plantilla Base"
-    if sheet_name == "Plantilla Base":
-        return False
-    
-    # Verificar si contiene al menos uno de los encabezados clave
-    has_resultados = any(df.iloc[:, 0].astype(str).str.contains("Resultados encuesta", case=False))
-    has_facilitadores = any(df.iloc[:, 0].astype(str).str.contains("Facilitadores", case=False))
-    has_fishbowl = any(df.iloc[:, 0].astype(str).str.contains("Fishbowl", case=False))
-    has_verbatims = False
+# Búsqueda de texto y agrupación por temas de los verbatims filtrados
+def render_verbatim_search(model, positions):
+    index = model.verbatim_index
+    documents = index.documents_for(positions)
+    if not len(documents):
+        st.info("No hay verbatims en los talleres seleccionados")
+        return
     
-    # Buscar VERBATIMS en cualquier columna
-    for col in range(len(df.columns)):
-        if any(df.iloc[:, col].astype(str).str.contains("VERBATIMS", case=False)):
-            has_verbatims = True
-            break
+    query = st.text_input("Buscar en los verbatims:", placeholder="Ejemplo: facilitación dinámica")
+    if query:
+        results, query_tokens, total = index.search(query, documents)
+        st.caption(f"{total} resultados" + (f" (se muestran los {len(results)} más relevantes)" if total > len(results) else ""))
+        st.markdown("\n".join(
+            f"- {highlight(index.texts[doc_id], query_tokens)} — *{model.workshops[index.positions[doc_id]].sheet_name}*"
+            for doc_id in results
+        ))
     
-    # Es una hoja de taller si tiene al menos dos de los elementos
-    criteria_met = [has_resultados, has_facilitadores, has_fishbowl, has_verbatims]
-    return sum(criteria_met) >= 2
+    # Temas: k-means sobre los vectores TF-IDF de los verbatims filtrados
+    theme_col1, theme_col2 = st.columns([1, 3])
+    with theme_col1:
+        theme_count = st.number_input("Número de temas:", min_value=2, max_value=20, value=5)
+    with theme_col2:
+        show_themes = st.toggle("Agrupar por temas")
+    if show_themes:
+        for theme in index.cluster(documents, theme_count):
+            st.markdown(f"**{', '.join(theme['terminos']) or 'Sin términos'}** ({len(theme['documentos'])} verbatims)")
+            st.markdown("\n".join(f"- {index.texts[doc_id]}" for doc_id in theme["ejemplos"]))
 
-# Crear un diccionario con todos los talleres y sus facilitadores
-def create_facilitator_index(xls, workshop_sheets):
-    facilitator_index = {}
-    axialent_facilitators = set()  # Conjunto para almacenar solo facilitadores de Axialent
-    
-    for sheet_name in workshop_sheets:
+# Informes PDF de los talleres filtrados (uno por taller, país y facilitador),
+# generados en paralelo y descargados juntos en un ZIP
+def render_pdf_reports(workshops, workers):
+    selection_key = tuple(taller.sheet_name for taller in workshops)
+    st.caption(f"{len(workshops)} talleres seleccionados")
+    if st.button("Generar informes PDF"):
+        progress = st.progress(0.0, text="Generando informes...")
         try:
-            df = pd.read_excel(xls, sheet_name=sheet_name)
-            taller_data = extract_data_from_sheet(df)
-            
-            if not taller_data["facilitadores"].empty:
-                for _, row in taller_data["facilitadores"].iterrows():
-                    facilitator = row["Nombre"]
-                    empresa = row.get("Empresa", "").strip()
-                    
-                    # Registrar al facilitador en el índice general
-                    if facilitator not in facilitator_index:
-                        facilitator_index[facilitator] = []
-                    if sheet_name not in facilitator_index[facilitator]:
-                        facilitator_index[facilitator].append(sheet_name)
-                    
-                    # Si es de Axialent, añadirlo al conjunto de facilitadores de Axialent
-                    if empresa.lower() == "axialent":
-                        axialent_facilitators.add(facilitator)
+            output, count = generate_reports_zip(
+                workshops, workers,
+                progress=lambda done, total: progress.progress(done / total, text=f"Generando informes... {done}/{total}")
+            )
+            with output:
+                st.session_state.pdf_reports = (selection_key, count, output.read())
         except Exception as e:
-            print(f"Error al procesar facilitadores en {sheet_name}: {str(e)}")
+            st.error(f"Error al generar los informes: {str(e)}")
+        progress.empty()
     
-    return facilitator_index, axialent_facilitators
+    stored = st.session_state.get("pdf_reports")
+    if stored and stored[0] == selection_key:
+        st.download_button(
+            f"Descargar {stored[1]} informes (ZIP)",
+            data=stored[2],
+            file_name="informes_talleres.zip",
+            mime="application/zip"
+        )
 
-# Función simplificada para extraer datos con posiciones fijas
-def extract_data_from_sheet(df):
-    results = {
-        "resultados_encuesta": pd.DataFrame(),
-        "facilitadores": pd.DataFrame(),
-        "fishbowl": pd.DataFrame(),
-        "verbatims": []
-    }
+# Descarga de los talleres filtrados como tablas normalizadas (XLSX o CSV),
+# generada desde el modelo ya extraído sin volver a leer el Excel
+def render_data_export(workshops, sources):
+    export_format = st.radio("Formato:", ["XLSX", "CSV (ZIP)"], horizontal=True)
+    extension = "xlsx" if export_format == "XLSX" else "zip"
+    selection_key = (extension, tuple(sources), tuple(taller.sheet_name for taller in workshops))
+    if st.button("Preparar descarga"):
+        with st.spinner("Preparando datos..."):
+            with (export_xlsx if extension == "xlsx" else export_csv_zip)(workshops, sources) as output:
+                st.session_state.data_export = (selection_key, output.read())
     
-    try:
-        # 1. EXTRAER RESULTADOS DE ENCUESTA (posiciones fijas)
-        # Verificamos primero si es el formato de encuesta con % o no
-        resultados_data = {
-            "Métrica": ["Favorabilidad", "Aplicabilidad", "Response Rate"],
-            "Valor": ["", "", ""]
-        }
-        
-        # Verificamos la columna A para encontrar las filas correctas
-        fav_row = None
-        aplic_row = None
-        resp_row = None
-        
-        for i in range(min(10, len(df))):  # Buscamos en las primeras 10 filas
-            if isinstance(df.iloc[i, 0], str):
-                cell_value = df.iloc[i, 0].strip().lower()
-                if "favorabilidad" in cell_value:
-                    fav_row = i
-                elif "aplicabilidad" in cell_value:
-                    aplic_row = i
-                elif "response rate" in cell_value:
-                    resp_row = i
-        
-        # Si encontramos las filas, extraemos los valores
-        if fav_row is not None:
-            # Convertir a formato de porcentaje
-            val = df.iloc[fav_row, 1]
-            if isinstance(val, (int, float)):
-                resultados_data["Valor"][0] = f"{int(val*100) if val*100 == int(val*100) else val*100}%"
-            else:
-                resultados_data["Valor"][0] = f"{val}%"
-        
-        if aplic_row is not None:
-            # Convertir a formato de porcentaje
-            val = df.iloc[aplic_row, 1]
-            if isinstance(val, (int, float)):
-                resultados_data["Valor"][1] = f"{int(val*100) if val*100 == int(val*100) else val*100}%"
-            else:
-                resultados_data["Valor"][1] = f"{val}%"
-        
-        if resp_row is not None:
-            # Convertir a formato de porcentaje
-            val = df.iloc[resp_row, 1]
-            if isinstance(val, (int, float)):
-                resultados_data["Valor"][2] = f"{int(val*100) if val*100 == int(val*100) else val*100}%"
-            else:
-                resultados_data["Valor"][2] = f"{val}%"
-            
-        # Crear el dataframe
-        results["resultados_encuesta"] = pd.DataFrame(resultados_data)
-        
-    except Exception as e:
-        st.error(f"Error al extraer resultados de encuesta: {str(e)}")
-
-    try:
-        # 2. EXTRAER FACILITADORES
-        facilitadores_row = None
-        
-        # Buscar la fila que contiene "Facilitadores"
-        for i in range(len(df)):
-            if isinstance(df.iloc[i, 0], str) and "facilitadores" in df.iloc[i, 0].lower():
-                facilitadores_row = i
-                break
-        
-        if facilitadores_row is not None:
-            # Buscar el inicio de la siguiente sección o final de datos
-            next_section_row = len(df)
-            for i in range(facilitadores_row + 1, len(df)):
-                if isinstance(df.iloc[i, 0], str) and ("fishbowl" in df.iloc[i, 0].lower() or df.iloc[i, 0].strip() == ""):
-                    next_section_row = i
-                    break
-            
-            # Extraer los datos de facilitadores (columnas A y B)
-            facilitadores_data = []
-            for i in range(facilitadores_row + 1, next_section_row):
-                nombre = df.iloc[i, 0]
-                empresa = df.iloc[i, 1]  # Cambiamos "Rol" por "Empresa"
-                
-                # Solo incluir filas con datos válidos
-                if pd.notna(nombre) and str(nombre).strip() and nombre != "None":
-                    facilitadores_data.append({"Nombre": nombre, "Empresa": empresa})  # Cambiamos "Rol" por "Empresa"
-            
-            results["facilitadores"] = pd.DataFrame(facilitadores_data)
-    except Exception as e:
-        st.error(f"Error al extraer facilitadores: {str(e)}")
+    stored = st.session_state.get("data_export")
+    if stored and stored[0] == selection_key:
+        st.download_button(
+            f"Descargar {len(workshops)} talleres ({export_format})",
+            data=stored[1],
+            file_name=f"talleres.{extension}",
+            mime=EXPORT_MIME_TYPES[extension]
+        )
 
-    try:
-        # 3. EXTRAER FISHBOWL (solo nombres)
-        fishbowl_row = None
-        
-        # Buscar la fila que contiene "Fishbowl"
-        for i in range(len(df)):
-            if isinstance(df.iloc[i, 0], str) and "fishbowl" in df.iloc[i, 0].lower():
-                fishbowl_row = i
-                break
-        
-        if fishbowl_row is not None:
-            # Buscar el final de la sección o filas vacías
-            next_section_row = len(df)
-            for i in range(fishbowl_row + 1, len(df)):
-                # Verificar si es el final de los datos o el inicio de otra sección
-                if (pd.isna(df.iloc[i, 0]) or df.iloc[i, 0] == "" or 
-                    (isinstance(df.iloc[i, 0], str) and len(df.iloc[i, 0].strip()) == 0)):
-                    # Verificar si hay varias filas vacías consecutivas
-                    empty_count = 0
-                    for j in range(i, min(i+3, len(df))):
-                        if pd.isna(df.iloc[j, 0]) or df.iloc[j, 0] == "":
-                            empty_count += 1
-                        else:
-                            break
-                    if empty_count >= 2:  # Si hay 2+ filas vacías consecutivas
-                        next_section_row = i
-                        break
-            
-            # Extraer solo los nombres
-            fishbowl_data = []
-            for i in range(fishbowl_row + 1, next_section_row):
-                nombre = df.iloc[i, 0]
-                
-                # Solo incluir filas con datos válidos
-                if pd.notna(nombre) and str(nombre).strip() and nombre != "None":
-                    fishbowl_data.append({"Nombre": nombre})
-            
-            results["fishbowl"] = pd.DataFrame(fishbowl_data)
-    except Exception as e:
-        st.error(f"Error al extraer fishbowl: {str(e)}")
-
-    try:
-        # 4. EXTRAER VERBATIMS - SIEMPRE en columna D (índice 3)
-        # No buscamos la palabra VERBATIMS, simplemente extraemos todo de la columna D
-        verbatims_col = 3  # Corresponde a la columna D
-        
-        # Extraer todos los valores no vacíos de la columna D, excluyendo la palabra "VERBATIMS"
-        verbatims = []
-        for i in range(len(df)):
-            if i < len(df) and verbatims_col < len(df.columns):
-                cell_value = df.iloc[i, verbatims_col]
-                if pd.notna(cell_value):
-                    value_str = str(cell_value).strip()
-                    if value_str and value_str != "VERBATIMS" and "verbatims" not in value_str.lower():
-                        verbatims.append(value_str)
-        
-        results["verbatims"] = verbatims
-    except Exception as e:
-        st.error(f"Error al extraer verbatims: {str(e)}")
-        
-    return results
+# Panel de rendimiento: etapas y hojas más lentas de la última carga,
+# aciertos de caché, memoria y tiempo de dibujado de cada sección
+def render_profile_panel(ingest_profile, render_profile):
+    if ingest_profile is not None:
+        summary = ingest_profile.to_dict()
+        st.caption(f"Última carga: {ingest_profile.name or 'sin nombre'}")
+        col1, col2 = st.columns(2)
+        col1.metric("Tiempo total", f"{summary['total_s']:.2f} s")
+        col2.metric("Filas leídas", summary["filas"])
+        col1.metric("Caché (aciertos)", summary["cache_aciertos"])
+        col2.metric("Caché (fallos)", summary["cache_fallos"])
+        if summary["rss_max_mb"]:
+            st.caption(
+                f"Memoria máxima: {summary['rss_max_mb']['proceso']:.0f} MB "
+                f"(procesos hijos: {summary['rss_max_mb']['hijos']:.0f} MB)"
+            )
+        st.dataframe(
+            pd.DataFrame(list(ingest_profile.stages.items()), columns=["Etapa", "Segundos"]),
+            hide_index=True
+        )
+        st.write("Hojas más lentas:")
+        st.dataframe(
+            pd.DataFrame(ingest_profile.slowest_sheets(), columns=["hoja", "segundos", "filas", "taller", "origen", "error"]),
+            hide_index=True
+        )
+    else:
+        st.caption("Todavía no se ha cargado ningún archivo")
+    
+    entries, size, hits, loads, coalesced = get_model_cache().stats()
+    st.caption(
+        f"Modelos compartidos en memoria: {entries} ({size / (1024 * 1024):.1f} MB) · "
+        f"{hits} reutilizados · {loads} cargados · {coalesced} cargas simultáneas unificadas"
+    )
+    
+    if render_profile.stages:
+        st.write("Dibujado de la página:")
+        st.dataframe(
+            pd.DataFrame(list(render_profile.stages.items()), columns=["Sección", "Segundos"]),
+            hide_index=True
+        )
 
 # Título principal
 st.title("📊 Resultados encuestas de Satisfacción")
 
-# Cargar archivo Excel
-uploaded_file = st.file_uploader("Cargar archivo Excel", type=["xlsx", "xls"])
+# Orden de las tarjetas de talleres
+ORDER_FILE = "Orden del archivo"
+ORDER_DATE = "Fecha (año, mes y día)"
+
+# Modos de trabajo
+MODE_SINGLE = "Archivo individual"
+MODE_CORPUS = "Histórico (varios archivos)"
+
+# Sección de configuración
+with st.sidebar:
+    st.header("Configuración")
+    
+    # Un solo archivo o el histórico acumulado de muchos archivos
+    mode = st.radio("Modo:", [MODE_SINGLE, MODE_CORPUS])
+    
+    # Procesos para leer las hojas en paralelo (1 = secuencial)
+    parse_workers = st.number_input(
+        "Procesos para leer el archivo:",
+        min_value=1,
+        max_value=os.cpu_count() or 1,
+        value=1,
+        help="Usar varios procesos acelera la lectura de archivos con muchas hojas"
+    )
+    
+    # Número de tarjetas de taller por página
+    page_size = st.selectbox("Talleres por página:", [6, 12, 24, 48], index=1)
+    sort_order = st.selectbox("Ordenar talleres por:", [ORDER_FILE, ORDER_DATE])
+    
+    # Caché en disco: al volver a cargar un archivo solo se procesan las hojas nuevas o modificadas.
+    # El directorio lo fija la configuración del servidor (ENCUESTAS_CACHE_DIR), no cada sesión.
+    sheet_cache = None
+    if st.checkbox("Usar caché en disco", value=True):
+        st.caption(f"Caché: `{DEFAULT_CACHE_DIR}`")
+        cache_max_mb = st.number_input("Tamaño máximo de la caché (MB):", min_value=1, value=DEFAULT_MAX_MB)
+        try:
+            sheet_cache = SheetCache(DEFAULT_CACHE_DIR, cache_max_mb)
+            if st.button("Vaciar caché"):
+                sheet_cache.clear()
+                get_model_cache().clear()
+                st.success("Caché vaciada")
+            entries, size = sheet_cache.stats()
+            st.caption(f"{entries} hojas en caché ({size / (1024 * 1024):.1f} MB)")
+        except Exception as e:
+            st.warning(f"No se pudo usar la caché en disco: {e}")
+            sheet_cache = None
+    
+    # Histórico: base local donde se acumulan los talleres de todos los archivos cargados.
+    # El archivo lo fija la configuración del servidor, no cada sesión.
+    corpus = None
+    if mode == MODE_CORPUS:
+        st.caption(f"Histórico: `{DEFAULT_CORPUS_PATH}`")
+        try:
+            corpus = CorpusStore(DEFAULT_CORPUS_PATH)
+            if st.button("Vaciar histórico"):
+                corpus.clear()
+                load_corpus_model.clear()
+                st.success("Histórico vaciado")
+            workbook_count, workshop_count = corpus.stats()
+            st.caption(f"{workbook_count} archivos y {workshop_count} talleres en el histórico")
+        except Exception as e:
+            st.warning(f"No se pudo abrir el histórico: {e}")
+
+# Cargar archivo(s) Excel
+if mode == MODE_SINGLE:
+    uploaded_file = st.file_uploader("Cargar archivo Excel", type=["xlsx", "xls"])
+    uploaded_files = [uploaded_file] if uploaded_file else []
+else:
+    uploaded_files = st.file_uploader(
+        "Agregar archivos Excel al histórico",
+        type=["xlsx", "xls"],
+        accept_multiple_files=True
+    )
 
-if uploaded_file:
+# Perfiles de la carga y del dibujado de esta ejecución
+ingest_profile = None
+render_profile = IngestProfile(event="dibujado")
+
+if uploaded_files or corpus is not None:
     try:
         # Mostrar mensaje de carga
         with st.spinner("Analizando archivo Excel..."):
-            # Leer el archivo Excel completo para obtener los nombres de las hojas
-            xls = pd.ExcelFile(uploaded_file)
-            all_worksheet_names = xls.sheet_names
-            
-            # Filtrar solo las hojas que tienen formato de taller
-            workshop_sheets = []
-            workshop_countries = set()
-            workshop_months = set()
-            
-            for sheet_name in all_worksheet_names:
-                try:
-                    df = pd.read_excel(uploaded_file, sheet_name=sheet_name)
-                    if is_workshop_sheet(df, sheet_name):  # Pasamos también el nombre de la hoja
-                        workshop_sheets.append(sheet_name)
-                        # Extraer el país
-                        country = extract_country_from_sheet_name(sheet_name)
-                        workshop_countries.add(country)
-                        # Extraer el mes
-                        month = extract_month_from_sheet_name(sheet_name)
-                        workshop_months.add(month)
-                except Exception as e:
-                    st.warning(f"Error al analizar la hoja '{sheet_name}': {e}")
+            if mode == MODE_SINGLE:
+                # El modelo se guarda en caché según el contenido del archivo
+                file_bytes = uploaded_file.getvalue()
+                model, ingest_profile = load_workbook_model(
+                    hash_workbook_bytes(file_bytes), file_bytes, parse_workers, sheet_cache, uploaded_file.name
+                )
+                render_profile.name = uploaded_file.name
+                
+                for sheet_name, error in model.errors:
+                    st.warning(f"Error al analizar la hoja '{sheet_name}': {error}")
+            else:
+                # Los archivos ya cargados se reconocen por su contenido y no se vuelven a procesar
+                for uploaded in uploaded_files:
+                    profile = IngestProfile(uploaded.name)
+                    added, errors = corpus.add_workbook(uploaded.name, uploaded.getvalue(), parse_workers, sheet_cache, profile)
+                    for sheet_name, error in errors:
+                        st.warning(f"Error al analizar la hoja '{sheet_name}' de '{uploaded.name}': {error}")
+                    if profile.sheets:
+                        profile.finish().log()
+                        st.session_state.ingest_profile = profile
+                with render_profile.stage("histórico"):
+                    model = load_corpus_model(corpus.path, corpus.version())
+                ingest_profile = st.session_state.get("ingest_profile")
+                render_profile.name = corpus.path
             
+            workshop_sheets = model.sheet_names
             if not workshop_sheets:
                 st.warning("No se encontraron hojas con formato de taller en el archivo")
             else:
                 st.success(f"Se encontraron {len(workshop_sheets)} hojas con formato de taller")
-                
-            # Crear índice de facilitadores
-            facilitator_index, axialent_facilitators = create_facilitator_index(xls, workshop_sheets)
             
-            # Convertir a lista ordenada
-            workshop_countries = sorted(list(workshop_countries))
-            workshop_months = sorted(list(workshop_months), 
-                                  key=lambda x: ["Enero", "Febrero", "Marzo", "Abril", "Mayo", 
-                                              "Junio", "Julio", "Agosto", "Septiembre", 
-                                              "Octubre", "Noviembre", "Diciembre", 
-                                              "Sin mes específico"].index(x) 
-                                         if x in ["Enero", "Febrero", "Marzo", "Abril", "Mayo", 
-                                               "Junio", "Julio", "Agosto", "Septiembre", 
-                                               "Octubre", "Noviembre", "Diciembre", 
-                                               "Sin mes específico"] else 999)
-            all_facilitators = sorted(list(facilitator_index.keys()))
-            axialent_facilitators = sorted(list(axialent_facilitators))
+            filter_index = model.filter_index
         
         # FILTROS
         with st.expander("Filtros", expanded=True):
@@ -351,52 +398,51 @@ if uploaded_file:
                 # Filtro por país - sin valor por defecto
                 selected_countries = st.multiselect(
                     "Filtrar por país:",
-                    ["Todos"] + workshop_countries
+                    ["Todos"] + filter_index.values("pais")
                 )
             
             with col2:
                 # Filtro por mes - sin valor por defecto
                 selected_months = st.multiselect(
                     "Filtrar por mes:",
-                    ["Todos"] + workshop_months
+                    ["Todos"] + filter_index.values("mes")
                 )
             
             with col3:
                 # Filtro por facilitador - mostrar solo facilitadores de Axialent
                 selected_facilitator = st.selectbox(
                     "Filtrar por facilitador:",
-                    ["Todos"] + axialent_facilitators
+                    ["Todos"] + filter_index.values("facilitador_axialent")
                 )
             
-            # Aplicar filtros
-            # 1. Filtro por país
-            if "Todos" in selected_countries or not selected_countries:
-                filtered_by_country = workshop_sheets
-            else:
-                filtered_by_country = [
-                    sheet for sheet in workshop_sheets 
-                    if extract_country_from_sheet_name(sheet) in selected_countries
-                ]
+            col4, col5 = st.columns(2)
             
-            # 2. Filtro por mes
-            if "Todos" in selected_months or not selected_months:
-                filtered_by_country_month = filtered_by_country
-            else:
-                filtered_by_country_month = [
-                    sheet for sheet in filtered_by_country
-                    if extract_month_from_sheet_name(sheet) in selected_months
-                ]
+            with col4:
+                # Filtro por año
+                selected_years = st.multiselect(
+                    "Filtrar por año:",
+                    ["Todos"] + filter_index.values("año")
+                )
             
-            # 3. Filtro por facilitador
-            if selected_facilitator == "Todos":
-                filtered_worksheets = filtered_by_country_month
-            else:
-                # Intersección de talleres filtrados por país+mes y los del facilitador seleccionado
-                facilitator_workshops = facilitator_index.get(selected_facilitator, [])
-                filtered_worksheets = [
-                    sheet for sheet in filtered_by_country_month 
-                    if sheet in facilitator_workshops
-                ]
+            with col5:
+                # Filtro por empresa de los facilitadores
+                selected_companies = st.multiselect(
+                    "Filtrar por empresa:",
+                    ["Todos"] + filter_index.values("empresa")
+                )
+            
+            # Aplicar filtros: unión dentro de cada filtro e intersección entre filtros
+            filtered_positions = filter_index.select({
+                "pais": selected_countries,
+                "mes": selected_months,
+                "año": selected_years,
+                "empresa": selected_companies,
+                "facilitador": [selected_facilitator]
+            })
+            # Orden cronológico según la fecha del nombre de la hoja
+            if sort_order == ORDER_DATE:
+                filtered_positions.sort(key=lambda position: model.workshops[position].name_info.sort_key)
+            filtered_worksheets = [model.workshops[position] for position in filtered_positions]
                 
             if not filtered_worksheets:
                 st.warning("No hay talleres que coincidan con los filtros seleccionados")
@@ -404,19 +450,62 @@ if uploaded_file:
             # Mostrar el número de talleres filtrados
             st.info(f"Mostrando {len(filtered_worksheets)} de {len(workshop_sheets)} talleres")
         
+        # Indicadores agregados de los talleres filtrados
+        if filtered_worksheets:
+            with st.expander("Indicadores", expanded=True), render_profile.stage("indicadores"):
+                render_dashboard(filter_metrics(model.metrics_table, filtered_positions))
+            
+            # Análisis por facilitador: sin filtros se usan los acumulados calculados al cargar
+            # (o guardados en el histórico); solo con filtros se calculan sobre la selección
+            with st.expander("Facilitadores", expanded=False), render_profile.stage("facilitadores"):
+                if model.rollups is not None and len(filtered_positions) == len(model.workshops):
+                    scope = "Histórico completo" if mode == MODE_CORPUS else f"{len(filtered_worksheets)} talleres seleccionados"
+                    render_facilitator_analytics(model.rollups, scope)
+                else:
+                    render_facilitator_analytics(build_rollups(filtered_worksheets), f"{len(filtered_worksheets)} talleres seleccionados")
+            
+            # Búsqueda y temas de los verbatims, sin servicios externos
+            with st.expander("Buscar y agrupar verbatims", expanded=False), render_profile.stage("búsqueda"):
+                render_verbatim_search(model, filtered_positions)
+            
+            # Análisis de verbatims con IA, bajo demanda
+            with st.expander("Análisis de verbatims (IA)", expanded=False), render_profile.stage("análisis IA"):
+                render_verbatim_insights(filtered_worksheets, DEFAULT_CACHE_DIR)
+            
+            # Informes PDF para descargar
+            with st.expander("Informes PDF", expanded=False), render_profile.stage("informes PDF"):
+                render_pdf_reports(filtered_worksheets, parse_workers)
+            
+            # Datos normalizados para descargar
+            with st.expander("Exportar datos", expanded=False), render_profile.stage("exportación"):
+                # Cada taller lleva el libro del que viene (en el histórico, uno por taller)
+                sources = model.sources or (uploaded_file.name,) * len(model.workshops)
+                render_data_export(filtered_worksheets, [sources[position] for position in filtered_positions])
+        
         # Mostrar todos los talleres filtrados directamente (sin opción de selección manual)
         selected_worksheets = filtered_worksheets
         
         # Mostrar datos por taller
         if selected_worksheets:
-            # Botón para expandir/colapsar todos los talleres
-            expander_col1, expander_col2 = st.columns([1, 5])
+            page_count = math.ceil(len(selected_worksheets) / page_size)
+            # Volver a la primera página si los filtros dejan menos páginas
+            if st.session_state.get("page", 1) > page_count:
+                st.session_state.page = 1
+            
+            # Botón para expandir/colapsar los talleres de la página
+            expander_col1, expander_col2, expander_col3 = st.columns([1, 3, 2])
+            with expander_col3:
+                page = st.number_input(f"Página (de {page_count}):", min_value=1, max_value=page_count, key="page")
+            page_positions = filtered_positions[(page - 1) * page_size:page * page_size]
+            
             with expander_col1:
                 if "expand_all" not in st.session_state:
-                    st.session_state.expand_all = True
+                    st.session_state.expand_all = False
                 
                 if st.button("Expandir/Colapsar Todos"):
                     st.session_state.expand_all = not st.session_state.expand_all
+                    for position in page_positions:
+                        st.session_state[f"details_{model.content_hash}_{position}"] = st.session_state.expand_all
             
             with expander_col2:
                 st.write(f"Estado actual: {'Expandidos' if st.session_state.expand_all else 'Colapsados'}")
@@ -426,64 +515,41 @@ if uploaded_file:
             # Crear organización de 3 columnas para las tarjetas
             cols = st.columns(3)
             
-            # Procesar cada taller seleccionado
-            for i, ws_name in enumerate(selected_worksheets):
-                with cols[i % 3]:
-                    # Crear tarjeta expandible para cada taller
-                    with st.expander(f"📘 {ws_name}", expanded=st.session_state.expand_all):
-                        # Leer la hoja específica
-                        df = pd.read_excel(uploaded_file, sheet_name=ws_name)
-                        
-                        # Extraer todos los datos de la hoja
-                        taller_data = extract_data_from_sheet(df)
-                        
-                        # 1. MOSTRAR RESULTADOS DE ENCUESTA
-                        st.subheader("Resultados de Encuesta")
-                        if not taller_data["resultados_encuesta"].empty:
-                            # Mostrar como tabla sin crear gráfico
-                            st.dataframe(taller_data["resultados_encuesta"], hide_index=True)
-                        else:
-                            st.info("No se encontraron datos de resultados de encuesta")
-                        
-                        # 2. MOSTRAR FACILITADORES
-                        st.subheader("Facilitadores")
-                        if not taller_data["facilitadores"].empty:
-                            # Filtrar de nuevo para asegurarnos que no hay filas con None
-                            facilitadores_cleaned = taller_data["facilitadores"].copy()
-                            facilitadores_cleaned = facilitadores_cleaned[
-                                facilitadores_cleaned["Nombre"].astype(str).str.lower() != "none"
-                            ]
-                            # Mostrar tabla sin índices
-                            st.dataframe(facilitadores_cleaned, hide_index=True)
-                        else:
-                            st.info("No se encontraron datos de facilitadores")
+            # Procesar solo los talleres de la página actual
+            with render_profile.stage("tarjetas"):
+                for i, position in enumerate(page_positions):
+                    with cols[i % 3]:
+                        # Usar los datos ya extraídos al cargar el archivo
+                        taller = model.workshops[position]
                         
-                        # 3. MOSTRAR FISHBOWL
-                        st.subheader("Fishbowl")
-                        if not taller_data["fishbowl"].empty:
-                            # Solo mostrar nombre
-                            st.dataframe(taller_data["fishbowl"], hide_index=True)
-                        else:
-                            st.info("No se encontraron datos de fishbowl")
-                        
-                        # 4. MOSTRAR VERBATIMS
-                        st.subheader("Verbatims")
-                        if taller_data["verbatims"]:
-                            # Mostrar verbatims en una lista con numeración
-                            for j, verbatim in enumerate(taller_data["verbatims"]):
-                                st.markdown(f"**{j+1}.** {verbatim}")
-                        else:
-                            st.info("No se encontraron verbatims")
+                        # Tarjeta con cabecera ligera; el detalle se dibuja solo al abrirla
+                        with st.container(border=True):
+                            st.markdown(f"**📘 {taller.sheet_name}**")
+                            st.caption(workshop_summary(taller))
+                            
+                            details_key = f"details_{model.content_hash}_{position}"
+                            st.session_state.setdefault(details_key, st.session_state.expand_all)
+                            if st.toggle("Ver detalle", key=details_key):
+                                render_workshop_details(taller)
     
     except Exception as e:
+        logger.exception("Error al procesar el archivo")
         st.error(f"Error al procesar el archivo: {str(e)}")
         st.info("Detalles técnicos del error para ayudar a diagnosticar el problema:")
         st.code(str(e))
 
-# Sección de configuración
+# Rendimiento de la carga y del dibujado; en el log solo los dibujados lentos,
+# para no tapar los perfiles de carga con una línea por cada interacción
+if render_profile.stages:
+    render_profile.finish()
+    if render_profile.total >= SLOW_RENDER_SECONDS:
+        render_profile.log()
+with st.sidebar:
+    with st.expander("Rendimiento", expanded=False):
+        render_profile_panel(ingest_profile, render_profile)
+
+# Información de la aplicación
 with st.sidebar:
-    st.header("Configuración")
-    
     st.subheader("Acerca de la App")
     st.write("""
     Esta aplicación visualiza los Resultados encuestas de Satisfacción extraídos de archivos Excel.
@@ -494,7 +560,7 @@ with st.sidebar:
     st.write("""
     1. Carga el archivo Excel que contiene los datos de los talleres
     2. Utiliza los filtros para seleccionar talleres por país o facilitador
-    3. Explora los datos en las tarjetas expandibles
+    3. Explora los datos en las tarjetas; usa "Ver detalle" para abrir cada una
     """)
     
     st.info("""
@@ -0,0 +1,136 @@
+import argparse
+import io
+import random
+
+from openpyxl import Workbook
+
+from workshop_parser import MONTH_ORDER
+
+# Datos de ejemplo para rellenar la plantilla
+COUNTRIES = ["ARG", "BRA", "CHL", "COL", "MEX"]
+FACILITATORS = ["Ana Pérez", "Juan Gómez", "Maria Silva", "Pedro Lima", "Lucía Fernández", "Carlos Ruiz"]
+COMPANIES = ["Axialent", "Cliente", "Partner"]
+PARTICIPANTS = ["Sofía", "Mateo", "Valentina", "Santiago", "Camila", "Joaquín", "Isabela", "Thiago"]
+PORTUGUESE_MONTHS = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho", "Julho",
+                     "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
+VERBATIM_PHRASES = [
+    "Excelente facilitación, aprendí mucho",
+    "Muy dinámico y práctico",
+    "El taller fue muy bueno pero corto",
+    "Me gustaría tener más ejemplos aplicados al trabajo",
+    "La dinámica del fishbowl fue muy enriquecedora",
+    "Poderia ser mais longo, mas foi ótimo",
+    "Gran espacio para reflexionar sobre la comunicación del equipo",
+    "Faltó tiempo para las preguntas"
+]
+
+# Nombre de hoja como los reales: código de país y mes (en portugués en parte de las hojas de BRA), o una fecha
+# (con ruido también países fuera de la lista)
+def _sheet_name(rng, index, noise):
+    country = rng.choice(COUNTRIES) if rng.random() >= noise / 4 else "PER"
+    if rng.random() < noise:
+        name = f"{country} {rng.randint(1, 28)}-{rng.randint(1, 12)}"
+    else:
+        months = PORTUGUESE_MONTHS if country == "BRA" and rng.random() < 0.5 else MONTH_ORDER[:12]
+        name = f"{country} {rng.choice(months)}"
+        if rng.random() < 0.5:
+            name += f" {rng.randint(2021, 2025)}"
+    return f"{name} T{index}"[:31]
+
+# Valor de una métrica: fracción de Excel o, con ruido, texto en porcentaje
+def _metric_value(rng, noise):
+    value = round(rng.uniform(0.5, 1), 3)
+    if rng.random() < noise:
+        return rng.choice([f"{value * 100:.1f}%".replace(".", ","), str(round(value * 100)), "-"])
+    return value
+
+# Encabezado de sección, con variaciones de mayúsculas y espacios si hay ruido
+def _heading(rng, text, noise):
+    if rng.random() < noise:
+        return rng.choice([text.upper(), text.lower(), f" {text} "])
+    return text
+
+# Filas (columnas A-D) de una hoja de taller con la estructura de la plantilla:
+# bloque de resultados, facilitadores con empresa, fishbowl y verbatims en la columna D
+def _workshop_rows(rng, title, verbatims, noise):
+    left = [
+        [title, None],
+        [_heading(rng, "Resultados encuesta", noise), None],
+        ["Favorabilidad", _metric_value(rng, noise)],
+        ["Aplicabilidad", _metric_value(rng, noise)],
+        ["Response Rate", _metric_value(rng, noise)],
+        [None, None],
+        [_heading(rng, "Facilitadores", noise), "Empresa"]
+    ]
+    for _ in range(rng.randint(1, 3)):
+        left.append([rng.choice(FACILITATORS), rng.choice(COMPANIES)])
+    if rng.random() < noise:
+        left.append(["None", None])
+    left.append([_heading(rng, "Fishbowl", noise), None])
+    left.extend([rng.choice(PARTICIPANTS), None] for _ in range(rng.randint(0, 5)))
+    if rng.random() < noise:
+        left.extend([[None, None], [None, None], ["Notas internas", None]])
+    
+    column_d = [None, _heading(rng, "VERBATIMS", noise)]
+    for _ in range(verbatims):
+        if rng.random() < noise:
+            column_d.append(rng.choice(["None", "  ", 42, None]))
+        else:
+            column_d.append(rng.choice(VERBATIM_PHRASES))
+    
+    rows = []
+    for i in range(max(len(left), len(column_d))):
+        a, b = left[i] if i < len(left) else (None, None)
+        rows.append([a, b, None, column_d[i] if i < len(column_d) else None])
+    return rows
+
+# Libro sintético con el formato de las encuestas reales. Incluye la hoja
+# "Plantilla Base" y, con ruido, hojas que no son de taller para probar la detección.
+def generate_workbook(sheets=10, verbatims=15, noise=0.1, seed=0):
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    
+    template = workbook.create_sheet("Plantilla Base")
+    for row in _workshop_rows(random.Random(seed), "Plantilla", 0, 0):
+        template.append(row)
+    
+    used_names = set()
+    for index in range(sheets):
+        name = _sheet_name(rng, index, noise)
+        while name in used_names:
+            name = _sheet_name(rng, index, noise)
+        used_names.add(name)
+        worksheet = workbook.create_sheet(name)
+        for row in _workshop_rows(rng, name, verbatims, noise):
+            worksheet.append(row)
+        
+        if rng.random() < noise / 4:
+            extra = workbook.create_sheet(f"Resumen {index}")
+            extra.append(["Resumen", None, None, None])
+            extra.append(["Total", rng.randint(1, 100), None, None])
+    
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+# Guardar un libro sintético en disco
+def write_workbook(path, sheets=10, verbatims=15, noise=0.1, seed=0):
+    data = generate_workbook(sheets, verbatims, noise, seed)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera libros Excel sintéticos con el formato de las encuestas")
+    parser.add_argument("output", help="Archivo .xlsx de salida")
+    parser.add_argument("-s", "--sheets", type=int, default=10, help="Número de hojas de taller")
+    parser.add_argument("-v", "--verbatims", type=int, default=15, help="Verbatims por taller")
+    parser.add_argument("-n", "--noise", type=float, default=0.1, help="Probabilidad de variaciones (0-1)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla aleatoria")
+    args = parser.parse_args(argv)
+    
+    write_workbook(args.output, args.sheets, args.verbatims, args.noise, args.seed)
+    print(f"{args.output}: {args.sheets} talleres")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos de la aplicación están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_workbooks import generate_workbook  # noqa: E402
+from workshop_parser import build_workbook_model  # noqa: E402
+
+# Libro sintético pequeño con variaciones, compartido por las pruebas
+@pytest.fixture(scope="session")
+def workbook_data():
+    return generate_workbook(40, 5, 0.3, 7)
+
+@pytest.fixture(scope="session")
+def workbook_model(workbook_data):
+    return build_workbook_model(workbook_data)
@@ -0,0 +1,16 @@
+import pytest
+
+from workshop_parser import WorkbookReader, build_workbook_model, locate_sections
+
+# Tiempos de la ingesta con pytest-benchmark (se omiten si no está instalado)
+pytest.importorskip("pytest_benchmark")
+
+def test_build_workbook_model(benchmark, workbook_data):
+    model = benchmark(build_workbook_model, workbook_data)
+    assert model.workshops
+
+def test_locate_sections(benchmark, workbook_data):
+    with WorkbookReader(workbook_data) as reader:
+        df = reader.read(reader.sheet_names[1])
+    sections = benchmark(locate_sections, df)
+    assert "facilitadores" in sections
@@ -0,0 +1,54 @@
+import numpy as np
+
+from corpus_store import CorpusStore
+from facilitator_analytics import build_rollups
+from synthetic_workbooks import generate_workbook
+
+# Los acumulados guardados con upserts al agregar libros coinciden con build_rollups
+def test_rollups_match_build_rollups(tmp_path, workbook_data):
+    store = CorpusStore(str(tmp_path / "historico.sqlite"))
+    store.add_workbook("a.xlsx", workbook_data)
+    store.add_workbook("b.xlsx", generate_workbook(25, 3, 0.3, 8))
+    # El mismo libro no se agrega dos veces
+    assert store.add_workbook("a.xlsx", workbook_data) == (0, [])
+    
+    model = store.load_model()
+    stored, expected = model.rollups, build_rollups(model.workshops)
+    assert stored.workshops == expected.workshops
+    assert stored.axialent == expected.axialent
+    assert stored.pairs == expected.pairs
+    assert stored.stats.keys() == expected.stats.keys()
+    for key, (count, total) in expected.stats.items():
+        assert stored.stats[key][0] == count
+        assert np.isclose(stored.stats[key][1], total)
+    assert stored.periods.keys() == expected.periods.keys()
+    assert stored.histograms.keys() == expected.histograms.keys()
+    for key, histogram in expected.histograms.items():
+        assert np.array_equal(stored.histograms[key], histogram)
+    # Una fila por facilitador en el ranking
+    assert stored.leaderboard()["facilitador"].is_unique
+
+# Los talleres guardados se reconstruyen igual que al extraerlos del libro
+def test_load_model_rebuilds_workshops(tmp_path, workbook_data, workbook_model):
+    store = CorpusStore(str(tmp_path / "historico.sqlite"))
+    store.add_workbook("a.xlsx", workbook_data)
+    model = store.load_model()
+    assert len(model.workshops) == len(workbook_model.workshops)
+    for stored, extracted in zip(model.workshops, workbook_model.workshops):
+        assert stored.sheet_name == extracted.sheet_name
+        assert (stored.country, stored.month, stored.year) == (extracted.country, extracted.month, extracted.year)
+        assert stored.facilitadores == extracted.facilitadores
+        assert stored.fishbowl == extracted.fishbowl
+        assert stored.verbatims == extracted.verbatims
+        assert np.allclose(stored.metric_values, extracted.metric_values, equal_nan=True)
+    assert model.filter_index.select({"pais": ["COL"]}) == workbook_model.filter_index.select({"pais": ["COL"]})
+    assert model.sources == ("a.xlsx",) * len(model.workshops)
+
+def test_clear(tmp_path, workbook_data):
+    store = CorpusStore(str(tmp_path / "historico.sqlite"))
+    store.add_workbook("a.xlsx", workbook_data)
+    version = store.version()
+    store.clear()
+    assert store.stats() == (0, 0)
+    assert store.version() != version
+    assert not store.load_rollups().workshops
@@ -0,0 +1,15 @@
+import pytest
+
+from benchmark_ingestion import current_tables, frames_digest, load_golden
+from synthetic_workbooks import generate_workbook
+from workshop_parser import build_workbook_model
+
+GOLDEN = load_golden()
+
+# Los libros sintéticos se extraen igual que con la extracción original (huellas guardadas)
+@pytest.mark.parametrize("key", sorted(GOLDEN))
+def test_matches_original_extraction(key):
+    sheets, verbatims, noise, seed = key.split("/")
+    data = generate_workbook(int(sheets), int(verbatims), float(noise), int(seed))
+    model = build_workbook_model(data)
+    assert frames_digest(current_tables(model.workshops)) == GOLDEN[key]
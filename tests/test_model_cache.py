@@ -0,0 +1,49 @@
+import threading
+import time
+
+from model_cache import ModelCache
+
+def test_single_flight_loading():
+    cache = ModelCache(sizer=lambda value: 1)
+    calls = []
+    started = threading.Event()
+    
+    def load():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return "modelo"
+    
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("libro", load))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    # Una sola carga; el resto de las sesiones espera y reutiliza su resultado
+    assert calls == [1]
+    assert results == ["modelo"] * 8
+    assert cache.stats()[3] == 1
+
+def test_failed_load_is_retried():
+    cache = ModelCache(sizer=lambda value: 1)
+    
+    def fail():
+        raise ValueError("libro dañado")
+    
+    try:
+        cache.get_or_load("libro", fail)
+    except ValueError:
+        pass
+    assert cache.get_or_load("libro", lambda: "modelo") == "modelo"
+
+def test_evicts_least_recently_used():
+    cache = ModelCache(max_mb=2 / 1024 / 1024, sizer=lambda value: 1)
+    cache.get_or_load("a", lambda: "a")
+    cache.get_or_load("b", lambda: "b")
+    cache.get_or_load("a", lambda: "a")
+    cache.get_or_load("c", lambda: "c")
+    assert cache.stats()[0] == 2
+    assert cache.get_or_load("a", lambda: "recargado") == "a"
+    assert cache.get_or_load("b", lambda: "recargado") == "recargado"
@@ -0,0 +1,44 @@
+import numpy as np
+
+from verbatim_search import SparseVectors
+
+ROWS = [0, 0, 2, 2, 2, 3]
+COLUMNS = [1, 1, 0, 3, 3, 2]
+VALUES = [1.0, 2.0, 4.0, 1.0, 2.0, 5.0]
+
+# Misma matriz en forma densa
+DENSE = np.array([
+    [0, 3, 0, 0],
+    [0, 0, 0, 0],
+    [4, 0, 0, 3],
+    [0, 0, 5, 0],
+], dtype=np.float32)
+
+def vectors():
+    return SparseVectors.from_pairs(ROWS, COLUMNS, VALUES, DENSE.shape)
+
+def test_from_pairs_sums_repeated_cells():
+    matrix = vectors()
+    assert len(matrix) == 4
+    assert np.array_equal(np.stack([matrix.dense_row(i) for i in range(4)]), DENSE)
+
+def test_norms_and_normalized():
+    matrix = vectors()
+    assert np.allclose(matrix.norms(), np.linalg.norm(DENSE, axis=1))
+    normalized = matrix.normalized()
+    # Las filas vacías siguen vacías
+    assert np.allclose(normalized.norms(), [1, 0, 1, 1])
+
+def test_rows_and_dot():
+    matrix = vectors()
+    subset = matrix.rows([3, 0, 1])
+    assert np.array_equal(np.stack([subset.dense_row(i) for i in range(3)]), DENSE[[3, 0, 1]])
+    vector = np.array([1, 2, 3, 4], dtype=np.float32)
+    assert np.allclose(matrix.dot(vector), DENSE @ vector)
+    other = np.arange(8, dtype=np.float32).reshape(4, 2)
+    assert np.allclose(matrix.dot(other), DENSE @ other)
+
+def test_group_sums():
+    labels = [1, 0, 1, 0]
+    expected = np.stack([DENSE[[1, 3]].sum(axis=0), DENSE[[0, 2]].sum(axis=0)])
+    assert np.allclose(vectors().group_sums(labels, 2), expected)
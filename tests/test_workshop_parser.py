@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from workshop_parser import (SHEET_COLUMNS, Facilitator, Workshop, build_filter_index, extract_data_from_sheet,
+                             locate_sections, parse_sheet_name)
+
+# Hoja con la estructura de la plantilla (columnas A-D)
+def sheet(rows):
+    return pd.DataFrame([row + [None] * (len(SHEET_COLUMNS) - len(row)) for row in rows],
+                        columns=SHEET_COLUMNS, dtype=object)
+
+TEMPLATE = sheet([
+    ["COL Marzo T1", None, None, None],
+    ["Resultados encuesta", None, None, "VERBATIMS"],
+    ["Favorabilidad", 0.875, None, "Muy bueno"],
+    ["Aplicabilidad", "80,5%", None, "  "],
+    ["Response Rate", 0.5, None, "Corto"],
+    [None, None, None, None],
+    ["Facilitadores", "Empresa", None, None],
+    ["Ana Pérez", "Axialent ", None, None],
+    ["NONE", None, None, None],
+    ["Juan Gómez", None, None, None],
+    ["Fishbowl", None, None, None],
+    ["Sofía", None, None, None],
+    [" none", None, None, None],
+    ["Mateo", None, None, None],
+    [None, None, None, None],
+    [None, None, None, None],
+    ["Notas internas", None, None, None],
+])
+
+def test_locate_sections():
+    sections = locate_sections(TEMPLATE)
+    assert sections["metricas"] == {"Favorabilidad": 2, "Aplicabilidad": 3, "Response Rate": 4}
+    assert sections["resultados encuesta"][0] == 1
+    assert sections["facilitadores"] == (6, 10)
+    assert sections["fishbowl"] == (10, 14)
+
+def test_locate_sections_empty_sheet():
+    assert locate_sections(sheet([])) == {"metricas": {}}
+
+def test_extract_data_from_sheet():
+    data = extract_data_from_sheet(TEMPLATE)
+    assert data["errores"] == []
+    assert data["metricas"] == pytest.approx({"Favorabilidad": 87.5, "Aplicabilidad": 80.5, "Response Rate": 50.0})
+    # Las filas "None" (en cualquier combinación de mayúsculas) se descartan al extraer
+    assert data["facilitadores"] == (Facilitator("Ana Pérez", "Axialent"), Facilitator("Juan Gómez", ""))
+    assert data["fishbowl"] == ("Sofía", "Mateo")
+    assert data["verbatims"] == ["Muy bueno", "Corto"]
+
+@pytest.mark.parametrize("name, country, year, month, day, label", [
+    ("COL Marzo T1", "COL", None, 3, None, "T1"),
+    ("BRA Julho 2023", "BRA", 2023, 7, None, "BRA Julho 2023"),
+    ("ARG 21-01 2024", "ARG", 2024, 1, 21, "ARG 21-01 2024"),
+    ("MEX 15/03/2024", "MEX", 2024, 3, 15, "MEX 15/03/2024"),
+    ("COL 2024/03/15 T2", "COL", 2024, 3, 15, "T2"),
+    ("COL 2024-03-15", "COL", 2024, 3, 15, "COL 2024-03-15"),
+    ("CHL 2024-05 T1", "CHL", 2024, 5, None, "T1"),
+    ("COL 2024-02-30", "COL", 2024, None, None, "02-30"),
+])
+def test_parse_sheet_name(name, country, year, month, day, label):
+    info = parse_sheet_name(name)
+    assert (info.country, info.year, info.month, info.day, info.label) == (country, year, month, day, label)
+
+def workshop(name, country, month, year, *facilitators):
+    return Workshop(name, country, month, year, tuple(facilitators), (), (), (np.nan,) * 3)
+
+def test_filter_index_select():
+    workshops = [
+        workshop("a", "COL", "Marzo", "2024", Facilitator("Ana", "Axialent")),
+        workshop("b", "ARG", "Marzo", "2024", Facilitator("Juan", "Cliente")),
+        workshop("c", "COL", "Abril", "2023", Facilitator("Juan", "Cliente"), Facilitator("Ana", "Partner")),
+    ]
+    index = build_filter_index(workshops)
+    assert index.select({}) == [0, 1, 2]
+    assert index.select({"pais": ["Todos"]}) == [0, 1, 2]
+    # Dentro de una faceta se unen los valores; entre facetas se intersectan
+    assert index.select({"pais": ["COL", "ARG"]}) == [0, 1, 2]
+    assert index.select({"pais": ["COL"], "mes": ["Marzo"]}) == [0]
+    assert index.select({"facilitador": ["Ana"]}) == [0, 2]
+    assert index.select({"facilitador_axialent": ["Ana"]}) == [0]
+    assert index.select({"pais": ["PER"]}) == []
+    assert index.values("mes") == ["Marzo", "Abril"]
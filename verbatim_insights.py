@@ -0,0 +1,333 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+try:
+    from groq import AsyncGroq
+except ImportError:  # groq es opcional fuera de la app
+    AsyncGroq = None
+
+from parse_cache import DEFAULT_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Modelo y endpoint de Groq (GROQ_BASE_URL permite usar un servidor local de pruebas)
+DEFAULT_MODEL = os.environ.get("GROQ_MODEL", "llama-3.1-8b-instant")
+DEFAULT_BASE_URL = os.environ.get("GROQ_BASE_URL") or None
+
+# Límites por defecto de la API: solicitudes y tokens por minuto
+DEFAULT_REQUESTS_PER_MINUTE = 30
+DEFAULT_TOKENS_PER_MINUTE = 6000
+
+# Tamaño máximo (en tokens estimados) de los verbatims de una sola solicitud
+DEFAULT_BATCH_TOKENS = 1500
+
+# Sentimientos válidos en las respuestas
+SENTIMENTS = ("positivo", "neutral", "negativo")
+
+CLASSIFY_PROMPT = """Eres un analista de encuestas de satisfacción de talleres.
+Para cada comentario de la lista indica su sentimiento (positivo, neutral o negativo)
+y un tema breve de 1 a 3 palabras en español.
+Responde solo con JSON: {"resultados": [{"id": <id>, "sentimiento": "...", "tema": "..."}]}"""
+
+SUMMARY_PROMPT = """Eres un analista de encuestas de satisfacción de talleres.
+Para cada grupo de la lista recibes cuántos comentarios tiene, su reparto de sentimiento
+y los temas más frecuentes con el sentimiento de cada uno. Resume en español, en 2 o 3 frases
+por grupo, lo que dicen los participantes: puntos fuertes, aspectos a mejorar y temas que se repiten.
+Responde solo con JSON: {"resumenes": [{"id": <id>, "resumen": "..."}]}"""
+
+# Temas de cada grupo enviados para el resumen
+SUMMARY_THEMES = 8
+
+# Estimación rápida de tokens (aproximadamente 4 caracteres por token)
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+# Huella de un texto de verbatim, usada como clave de la caché
+def text_hash(text):
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+# Agrupar verbatims en lotes que no superen max_tokens estimados
+# (size calcula los tokens de cada elemento, para agrupar otros contenidos)
+def batch_verbatims(verbatims, max_tokens=DEFAULT_BATCH_TOKENS, size=estimate_tokens):
+    batches = []
+    batch = []
+    batch_tokens = 0
+    for verbatim in verbatims:
+        tokens = size(verbatim)
+        if batch and batch_tokens + tokens > max_tokens:
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append(verbatim)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+# Limitador de solicitudes y tokens por minuto (cubeta de fichas) para llamadas asíncronas
+class RateLimiter:
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+        self.request_capacity = requests_per_minute
+        self.token_capacity = tokens_per_minute
+        self.requests = float(requests_per_minute)
+        self.tokens = float(tokens_per_minute)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        self.requests = min(self.request_capacity, self.requests + elapsed * self.request_capacity / 60)
+        self.tokens = min(self.token_capacity, self.tokens + elapsed * self.token_capacity / 60)
+
+    # Esperar hasta poder hacer una solicitud de "tokens" tokens
+    async def acquire(self, tokens):
+        tokens = min(tokens, self.token_capacity)
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.requests >= 1 and self.tokens >= tokens:
+                    self.requests -= 1
+                    self.tokens -= tokens
+                    return
+                wait_requests = (1 - self.requests) * 60 / self.request_capacity
+                wait_tokens = (tokens - self.tokens) * 60 / self.token_capacity
+                await asyncio.sleep(max(wait_requests, wait_tokens, 0.01))
+
+# Caché en disco de los resultados del modelo, por huella del texto
+class InsightCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "verbatim_insights.sqlite")
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS verbatims (
+                    text_hash TEXT PRIMARY KEY,
+                    sentiment TEXT NOT NULL,
+                    theme TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS summaries (
+                    group_hash TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL
+                );
+            """)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    # {huella: {"sentimiento": ..., "tema": ...}} de las huellas encontradas
+    def get_verbatims(self, hashes):
+        hashes = list(hashes)
+        found = {}
+        with self._connect() as conn:
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for row in conn.execute(
+                    f"SELECT text_hash, sentiment, theme FROM verbatims WHERE text_hash IN ({placeholders})", chunk
+                ):
+                    found[row[0]] = {"sentimiento": row[1], "tema": row[2]}
+        return found
+
+    def put_verbatims(self, results):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO verbatims (text_hash, sentiment, theme) VALUES (?, ?, ?)",
+                [(key, value["sentimiento"], value["tema"]) for key, value in results.items()]
+            )
+
+    def get_summary(self, group_hash):
+        with self._connect() as conn:
+            row = conn.execute("SELECT summary FROM summaries WHERE group_hash = ?", (group_hash,)).fetchone()
+        return row[0] if row else None
+
+    def put_summary(self, group_hash, summary):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO summaries (group_hash, summary) VALUES (?, ?)", (group_hash, summary))
+
+# Huella de un grupo de verbatims (el orden no importa)
+def group_hash(verbatims):
+    digest = hashlib.sha256()
+    for key in sorted({text_hash(verbatim) for verbatim in verbatims}):
+        digest.update(key.encode("ascii"))
+    return digest.hexdigest()
+
+# Análisis de verbatims con Groq: clasificación en lotes y resúmenes por grupo,
+# con varias solicitudes simultáneas bajo un límite de solicitudes y tokens
+class VerbatimAnalyzer:
+    def __init__(self, api_key=None, model=DEFAULT_MODEL, base_url=DEFAULT_BASE_URL, cache=None,
+                 concurrency=4, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, batch_tokens=DEFAULT_BATCH_TOKENS, client=None):
+        if client is None:
+            if AsyncGroq is None:
+                raise ImportError("El paquete groq no está instalado")
+            api_key = api_key or os.environ.get("GROQ_API_KEY")
+            # Un servidor propio (GROQ_BASE_URL) puede no pedir clave, pero AsyncGroq exige una
+            if not api_key and base_url:
+                api_key = "sin-clave"
+            client = AsyncGroq(api_key=api_key, base_url=base_url)
+        self.client = client
+        self.model = model
+        self.cache = cache
+        self.concurrency = concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.batch_tokens = batch_tokens
+
+    async def _complete(self, system_prompt, user_content, limits, json_output=False):
+        limiter, semaphore = limits
+        await limiter.acquire(estimate_tokens(system_prompt) + estimate_tokens(user_content) + 300)
+        async with semaphore:
+            kwargs = {"response_format": {"type": "json_object"}} if json_output else {}
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_content}
+                ],
+                temperature=0,
+                **kwargs
+            )
+        return response.choices[0].message.content or ""
+
+    # Clasificar un lote; devuelve {huella: resultado} de los comentarios bien clasificados
+    async def _classify_batch(self, batch, limits):
+        payload = json.dumps([{"id": i, "texto": text} for i, text in enumerate(batch)], ensure_ascii=False)
+        try:
+            content = await self._complete(CLASSIFY_PROMPT, payload, limits, json_output=True)
+            items = json.loads(content).get("resultados", [])
+        except Exception as e:
+            logger.warning("Error al clasificar un lote de %d verbatims: %s", len(batch), e)
+            return {}
+        results = {}
+        for item in items:
+            try:
+                text = batch[int(item["id"])]
+            except (KeyError, ValueError, TypeError, IndexError):
+                continue
+            sentiment = str(item.get("sentimiento", "")).strip().lower()
+            results[text_hash(text)] = {
+                "sentimiento": sentiment if sentiment in SENTIMENTS else "neutral",
+                "tema": str(item.get("tema", "")).strip() or "Sin tema"
+            }
+        return results
+
+    # Resumir varios grupos en una sola solicitud a partir de su clasificación.
+    # batch es una lista de (nombre, datos del grupo); devuelve {nombre: resumen}.
+    async def _summarize_batch(self, batch, limits):
+        payload = json.dumps([{"id": i, **digest} for i, (name, digest) in enumerate(batch)], ensure_ascii=False)
+        try:
+            content = await self._complete(SUMMARY_PROMPT, payload, limits, json_output=True)
+            items = json.loads(content).get("resumenes", [])
+        except Exception as e:
+            logger.warning("Error al resumir un lote de %d grupos: %s", len(batch), e)
+            return {}
+        summaries = {}
+        for item in items:
+            try:
+                name = batch[int(item["id"])][0]
+            except (KeyError, ValueError, TypeError, IndexError):
+                continue
+            summary = str(item.get("resumen", "")).strip()
+            if summary:
+                summaries[name] = summary
+        return summaries
+
+    # Analizar grupos {nombre: [verbatims]}: clasifica cada verbatim distinto una sola vez
+    # y luego resume los grupos a partir de la clasificación, varios por solicitud, sin
+    # volver a enviar los verbatims. Devuelve ({huella: resultado}, {nombre: resumen}).
+    async def analyze(self, groups):
+        limits = (RateLimiter(self.requests_per_minute, self.tokens_per_minute), asyncio.Semaphore(self.concurrency))
+        
+        unique = {}
+        for verbatims in groups.values():
+            for verbatim in verbatims:
+                unique.setdefault(text_hash(verbatim), verbatim)
+        results = self.cache.get_verbatims(unique) if self.cache is not None else {}
+        pending = [text for key, text in unique.items() if key not in results]
+        
+        outputs = await asyncio.gather(*[
+            self._classify_batch(batch, limits) for batch in batch_verbatims(pending, self.batch_tokens)
+        ])
+        classified = {}
+        for output in outputs:
+            classified.update(output)
+        if self.cache is not None and classified:
+            self.cache.put_verbatims(classified)
+        results.update(classified)
+        
+        # El resumen depende solo de los datos enviados: se guardan en caché por su huella
+        summaries = {}
+        keys = {}
+        digests = []
+        for name, verbatims in groups.items():
+            digest = group_digest(verbatims, results)
+            if digest is None:
+                continue
+            keys[name] = hashlib.sha256(json.dumps(digest, sort_keys=True).encode("utf-8")).hexdigest()
+            cached = self.cache.get_summary(keys[name]) if self.cache is not None else None
+            if cached is not None:
+                summaries[name] = cached
+            else:
+                digests.append((name, digest))
+        
+        outputs = await asyncio.gather(*[
+            self._summarize_batch(batch, limits)
+            for batch in batch_verbatims(digests, self.batch_tokens, size=lambda item: estimate_tokens(json.dumps(item[1], ensure_ascii=False)))
+        ])
+        for output in outputs:
+            for name, summary in output.items():
+                summaries[name] = summary
+                if self.cache is not None:
+                    self.cache.put_summary(keys[name], summary)
+        return results, summaries
+
+    # Versión síncrona de analyze, para usar desde Streamlit o scripts
+    def analyze_sync(self, groups):
+        return asyncio.run(self.analyze(groups))
+
+# Reparto de sentimiento y sentimiento por tema de los verbatims clasificados de un grupo
+def count_sentiments(verbatims, results):
+    counts = {sentiment: 0 for sentiment in SENTIMENTS}
+    themes = {}
+    for key in map(text_hash, verbatims):
+        item = results.get(key)
+        if item is None:
+            continue
+        counts[item["sentimiento"]] += 1
+        theme = themes.setdefault(item["tema"], {sentiment: 0 for sentiment in SENTIMENTS})
+        theme[item["sentimiento"]] += 1
+    return counts, themes
+
+# Datos de un grupo enviados para resumirlo (None si no hay verbatims clasificados)
+def group_digest(verbatims, results, top_themes=SUMMARY_THEMES):
+    counts, themes = count_sentiments(verbatims, results)
+    if not any(counts.values()):
+        return None
+    top = sorted(themes, key=lambda theme: sum(themes[theme].values()), reverse=True)[:top_themes]
+    return {
+        "comentarios": sum(counts.values()),
+        **counts,
+        "temas": [{"tema": theme, **themes[theme]} for theme in top]
+    }
+
+# Resumen por grupo: número de verbatims, reparto de sentimiento y temas más frecuentes
+def summarize_groups(groups, results, summaries, top_themes=3):
+    rows = []
+    for name, verbatims in groups.items():
+        counts, themes = count_sentiments(verbatims, results)
+        top = sorted(themes, key=lambda theme: sum(themes[theme].values()), reverse=True)[:top_themes]
+        rows.append({
+            "grupo": name,
+            "verbatims": len(verbatims),
+            **{sentiment.capitalize(): counts[sentiment] for sentiment in SENTIMENTS},
+            "temas": ", ".join(top),
+            "resumen": summaries.get(name) or ""
+        })
+    return rows
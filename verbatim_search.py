@@ -0,0 +1,285 @@
+import bisect
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+
+# Palabras vacías en español y portugués (ya normalizadas, sin acentos)
+STOPWORDS = frozenset("""
+a al algo algunas algunos ante antes aquel aquella aqui asi aun bien cada casi como con contra cual
+cuando de del desde donde dos durante e el ella ellas ellos en entre era eran es esa esas ese eso esos
+esta estaba estan estar estas este esto estos fue fueron ha habia han hasta hay la las le les lo los
+mas me mi mis mucho muy nada ni no nos nosotros o os otra otras otro otros para pero poco por porque
+que quien se ser si sin sobre son su sus tambien tan tanto te tiene tienen todo todos tu tus un una
+unas uno unos y ya yo
+ao aos as com da das dele dela deles do dos ela elas ele eles em essa esse esta este eu foi isso isto
+lhe mais mas meu minha muito na nao nas nem no nos num numa ou pela pelas pelo pelos pra quando se sem
+seu sua suas teu tem ter um uma umas uns voce voces
+""".split())
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Dimensión por defecto de los vectores TF-IDF (los términos se agrupan por hash)
+DEFAULT_DIMENSIONS = 512
+
+# Token normalizado: minúsculas y sin acentos
+def normalize_token(token):
+    decomposed = unicodedata.normalize("NFKD", token.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+# Tokens normalizados de un texto, sin palabras vacías ni números sueltos
+def tokenize(text):
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text):
+        token = normalize_token(match.group())
+        if len(token) > 1 and token not in STOPWORDS and not token.isdigit():
+            tokens.append(token)
+    return tokens
+
+# Marcar en negrita (markdown) las palabras del texto que coinciden con la búsqueda
+def highlight(text, query_tokens):
+    if not query_tokens:
+        return text
+    parts = []
+    last = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        token = normalize_token(match.group())
+        if any(token.startswith(query) for query in query_tokens):
+            parts.append(text[last:match.start()])
+            parts.append(f"**{match.group()}**")
+            last = match.end()
+    parts.append(text[last:])
+    return "".join(parts)
+
+# Matriz dispersa en formato CSR (una fila por verbatim): solo guarda los valores
+# distintos de cero de cada fila, con las operaciones que usan la búsqueda y los temas
+class SparseVectors:
+    def __init__(self, indptr, indices, data, columns):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.columns = columns
+
+    # Crear la matriz a partir de (fila, columna, valor); los valores de una misma celda se suman
+    @classmethod
+    def from_pairs(cls, rows, columns, values, shape):
+        n_rows, n_columns = shape
+        keys = np.asarray(rows, dtype=np.int64) * n_columns + np.asarray(columns, dtype=np.int64)
+        keys, inverse = np.unique(keys, return_inverse=True)
+        data = np.bincount(inverse, weights=values, minlength=len(keys)).astype(np.float32)
+        indptr = np.searchsorted(keys // n_columns, np.arange(n_rows + 1))
+        return cls(indptr, (keys % n_columns).astype(np.int32), data, n_columns)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
+
+    # Fila de cada valor guardado
+    def _row_ids(self):
+        return np.repeat(np.arange(len(self)), np.diff(self.indptr))
+
+    # Norma euclídea de cada fila
+    def norms(self):
+        squares = self.data.astype(np.float64) ** 2
+        return np.sqrt(np.bincount(self._row_ids(), weights=squares, minlength=len(self)))
+
+    # Misma matriz con las filas normalizadas (las filas vacías quedan vacías)
+    def normalized(self):
+        norms = self.norms()
+        scale = np.where(norms == 0, 1, norms)[self._row_ids()]
+        return SparseVectors(self.indptr, self.indices, (self.data / scale).astype(np.float32), self.columns)
+
+    # Submatriz con las filas indicadas, en ese orden
+    def rows(self, row_ids):
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        starts = self.indptr[row_ids]
+        lengths = self.indptr[row_ids + 1] - starts
+        indptr = np.concatenate([[0], np.cumsum(lengths)])
+        positions = np.repeat(starts - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return SparseVectors(indptr, self.indices[positions], self.data[positions], self.columns)
+
+    # Una fila como vector denso
+    def dense_row(self, row_id):
+        vector = np.zeros(self.columns, dtype=np.float32)
+        start, end = self.indptr[row_id], self.indptr[row_id + 1]
+        vector[self.indices[start:end]] = self.data[start:end]
+        return vector
+
+    # Producto por un vector (columnas) o por una matriz densa (columnas x k)
+    def dot(self, other):
+        other = np.asarray(other, dtype=np.float32)
+        row_ids = self._row_ids()
+        if other.ndim == 1:
+            products = self.data * other[self.indices]
+            return np.bincount(row_ids, weights=products, minlength=len(self)).astype(np.float32)
+        products = self.data[:, None] * other[self.indices]
+        return np.column_stack([
+            np.bincount(row_ids, weights=products[:, j], minlength=len(self)) for j in range(other.shape[1])
+        ]).astype(np.float32)
+
+    # Suma de las filas de cada grupo (labels indica el grupo de cada fila): matriz densa
+    def group_sums(self, labels, groups):
+        keys = np.asarray(labels, dtype=np.int64)[self._row_ids()] * self.columns + self.indices
+        sums = np.bincount(keys, weights=self.data, minlength=groups * self.columns)
+        return sums.reshape(groups, self.columns).astype(np.float32)
+
+# Índice de todos los verbatims: índice invertido para la búsqueda y vectores
+# TF-IDF (con hashing de términos) para agrupar por temas y buscar parecidos
+class VerbatimIndex:
+    def __init__(self, texts, positions, dimensions=DEFAULT_DIMENSIONS):
+        self.texts = list(texts)
+        # Posición del taller de cada verbatim dentro del modelo
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.dimensions = dimensions
+        
+        # Pares (documento, término) de todos los tokens
+        vocabulary = {}
+        doc_ids = []
+        term_ids = []
+        for doc_id, text in enumerate(self.texts):
+            for token in tokenize(text):
+                doc_ids.append(doc_id)
+                term_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+        self.terms = list(vocabulary)
+        n_docs = len(self.texts)
+        n_terms = len(self.terms)
+        
+        # Frecuencia de cada término en cada documento
+        keys = np.asarray(doc_ids, dtype=np.int64) * max(n_terms, 1) + np.asarray(term_ids, dtype=np.int64)
+        keys, counts = np.unique(keys, return_counts=True)
+        self.pair_docs = keys // max(n_terms, 1)
+        self.pair_terms = keys % max(n_terms, 1)
+        
+        # Pesos TF-IDF de cada par
+        document_frequency = np.bincount(self.pair_terms, minlength=n_terms)
+        self.idf = np.log((1 + n_docs) / (1 + document_frequency)) + 1
+        self.pair_weights = (1 + np.log(counts)) * self.idf[self.pair_terms]
+        
+        # Índice invertido: documentos de cada término (ordenados)
+        order = np.argsort(self.pair_terms, kind="stable")
+        boundaries = np.searchsorted(self.pair_terms[order], np.arange(n_terms + 1))
+        sorted_docs = self.pair_docs[order]
+        self.postings = [sorted_docs[boundaries[i]:boundaries[i + 1]] for i in range(n_terms)]
+        self.sorted_terms = sorted(range(n_terms), key=self.terms.__getitem__)
+        self.sorted_term_names = [self.terms[i] for i in self.sorted_terms]
+        
+        # Vectores normalizados (una fila dispersa por verbatim)
+        self.term_dimensions = np.array(
+            [zlib.crc32(term.encode("utf-8")) % dimensions for term in self.terms], dtype=np.int64
+        )
+        self.vectors = SparseVectors.from_pairs(
+            self.pair_docs, self.term_dimensions[self.pair_terms], self.pair_weights, (n_docs, dimensions)
+        ).normalized()
+
+    def __len__(self):
+        return len(self.texts)
+
+    # Verbatims (ids) de los talleres indicados por su posición
+    def documents_for(self, positions):
+        return np.flatnonzero(np.isin(self.positions, list(positions)))
+
+    # Términos del vocabulario que empiezan por un prefijo
+    def _prefix_terms(self, prefix):
+        start = bisect.bisect_left(self.sorted_term_names, prefix)
+        end = bisect.bisect_left(self.sorted_term_names, prefix + "￿")
+        return self.sorted_terms[start:end]
+
+    # Buscar verbatims que contengan todas las palabras de la consulta (por prefijo).
+    # Devuelve (ids ordenados por relevancia, tokens de la consulta, total de coincidencias)
+    def search(self, query, documents=None, limit=50):
+        query_tokens = tokenize(query)
+        if not query_tokens or not len(self):
+            return [], query_tokens, 0
+        
+        matches = None
+        query_vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in query_tokens:
+            term_ids = self._prefix_terms(token)
+            docs = np.unique(np.concatenate([self.postings[i] for i in term_ids])) if term_ids else np.array([], dtype=np.int64)
+            matches = docs if matches is None else np.intersect1d(matches, docs, assume_unique=True)
+            for term_id in term_ids:
+                query_vector[self.term_dimensions[term_id]] += self.idf[term_id]
+        if documents is not None:
+            matches = np.intersect1d(matches, documents)
+        if not len(matches):
+            return [], query_tokens, 0
+        
+        scores = self.vectors.rows(matches).dot(query_vector)
+        ranked = matches[np.argsort(-scores, kind="stable")]
+        return ranked[:limit].tolist(), query_tokens, len(matches)
+
+    # Términos más representativos de un grupo de verbatims
+    def top_terms(self, documents, count=5):
+        mask = np.isin(self.pair_docs, documents)
+        weights = np.bincount(self.pair_terms[mask], weights=self.pair_weights[mask], minlength=len(self.terms))
+        top = np.argsort(-weights)[:count]
+        return [self.terms[i] for i in top if weights[i] > 0]
+
+    # Verbatims más parecidos a uno dado (similitud coseno)
+    def nearest(self, doc_id, documents=None, count=5):
+        candidates = np.arange(len(self)) if documents is None else np.asarray(documents)
+        candidates = candidates[candidates != doc_id]
+        scores = self.vectors.rows(candidates).dot(self.vectors.dense_row(doc_id))
+        best = np.argsort(-scores)[:count]
+        return [(int(candidates[i]), float(scores[i])) for i in best]
+
+    # Agrupar verbatims en k temas con k-means (similitud coseno, inicialización k-means++).
+    # Devuelve una lista de temas: {"terminos", "documentos", "ejemplos"} del más grande al más pequeño
+    def cluster(self, documents, k=5, iterations=25, seed=0):
+        documents = np.asarray(documents, dtype=np.int64)
+        documents = documents[self.vectors.rows(documents).norms() > 0]
+        if len(documents) == 0:
+            return []
+        vectors = self.vectors.rows(documents)
+        k = min(k, len(documents))
+        rng = np.random.default_rng(seed)
+        
+        # Inicialización k-means++
+        centroids = [vectors.dense_row(rng.integers(len(vectors)))]
+        distances = 1 - vectors.dot(centroids[0])
+        for _ in range(1, k):
+            probabilities = np.clip(distances, 0, None)
+            total = probabilities.sum()
+            index = rng.choice(len(vectors), p=probabilities / total) if total > 0 else rng.integers(len(vectors))
+            centroids.append(vectors.dense_row(index))
+            distances = np.minimum(distances, 1 - vectors.dot(centroids[-1]))
+        centroids = np.vstack(centroids)
+        
+        labels = np.full(len(vectors), -1)
+        for _ in range(iterations):
+            new_labels = np.argmax(vectors.dot(centroids.T), axis=1)
+            if np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+            # Nuevos centroides: suma de los vectores de cada grupo, normalizada
+            sums = vectors.group_sums(labels, k)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            centroids = np.where(empty[:, None], centroids, sums / np.where(norms == 0, 1, norms))
+        
+        themes = []
+        similarity = vectors.dot(centroids.T)[np.arange(len(vectors)), labels]
+        for cluster_id in range(k):
+            members = np.flatnonzero(labels == cluster_id)
+            if not len(members):
+                continue
+            closest = members[np.argsort(-similarity[members])[:3]]
+            themes.append({
+                "terminos": self.top_terms(documents[members]),
+                "documentos": documents[members].tolist(),
+                "ejemplos": documents[closest].tolist()
+            })
+        return sorted(themes, key=lambda theme: len(theme["documentos"]), reverse=True)
+
+# Crear el índice de verbatims de todos los talleres
+def build_verbatim_index(workshops, dimensions=DEFAULT_DIMENSIONS):
+    texts = []
+    positions = []
+    for position, workshop in enumerate(workshops):
+        texts.extend(workshop.verbatims)
+        positions.extend([position] * len(workshop.verbatims))
+    return VerbatimIndex(texts, positions, dimensions)
@@ -0,0 +1,835 @@
+import pandas as pd
+import numpy as np
+import datetime
+import io
+import re
+import sys
+import functools
+import hashlib
+import multiprocessing
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+import openpyxl
+from openpyxl.cell.cell import ERROR_CODES
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from ingest_profile import IngestProfile, profile_stage
+from verbatim_search import VerbatimIndex, build_verbatim_index
+
+# Orden de los meses para los filtros
+MONTH_ORDER = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio",
+               "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre",
+               "Sin mes específico"]
+
+# Códigos de país que usamos y nombres completos que también los identifican
+COUNTRY_CODES = {
+    "BRA": "Brasil",
+    "ARG": "Argentina",
+    "MEX": "México",
+    "CHL": "Chile",
+    "COL": "Colombia"
+}
+COUNTRY_ALIASES = {
+    "brasil": "BRA", "brazil": "BRA",
+    "argentina": "ARG",
+    "méxico": "MEX", "mexico": "MEX",
+    "chile": "CHL",
+    "colombia": "COL"
+}
+
+# Nombres de mes en español y portugués (para las hojas de BRA) y su número
+MONTH_NUMBERS = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
+    "julio": 7, "agosto": 8, "septiembre": 9, "setiembre": 9, "octubre": 10,
+    "noviembre": 11, "diciembre": 12,
+    "janeiro": 1, "fevereiro": 2, "março": 3, "marco": 3, "maio": 5, "junho": 6,
+    "julho": 7, "setembro": 9, "outubro": 10, "novembro": 11, "dezembro": 12
+}
+
+# Patrones precompilados. Los códigos y meses deben ser palabras completas
+# (no rodeadas de letras) para que "COL" no coincida dentro de "COLABORADORES".
+_NOT_LETTER_BEFORE = r"(?<![^\W\d_])"
+_NOT_LETTER_AFTER = r"(?![^\W\d_])"
+COUNTRY_PATTERN = re.compile(_NOT_LETTER_BEFORE + "(" + "|".join(COUNTRY_CODES) + ")" + _NOT_LETTER_AFTER)
+COUNTRY_ALIAS_PATTERN = re.compile(
+    _NOT_LETTER_BEFORE + "(" + "|".join(COUNTRY_ALIASES) + ")" + _NOT_LETTER_AFTER, re.IGNORECASE
+)
+_MONTH_ALTERNATIVES = "|".join(sorted(MONTH_NUMBERS, key=len, reverse=True))
+MONTH_PATTERN = re.compile(
+    r"(?:(?<!\d)(\d{1,2})\s+de\s+)?" + _NOT_LETTER_BEFORE + "(" + _MONTH_ALTERNATIVES + ")" + _NOT_LETTER_AFTER,
+    re.IGNORECASE
+)
+# Fechas numéricas: 21/01, 21-01, 21.01, con año opcional (21/01/2024 o 21/01/24).
+# El espacio no separa día y mes, y los números pegados a una letra (T10) no son fechas.
+DATE_PATTERN = re.compile(r"(?<![^\W_])(\d{1,2})[/\-\.](\d{1,2})(?:[/\-\.](\d{4}|\d{2}))?(?!\d)")
+# Fechas ISO con el año delante: 2024-03-15, 2024/03/15 o solo 2024-03 (se buscan antes que DD/MM)
+ISO_DATE_PATTERN = re.compile(r"(?<![^\W_])(\d{4})([/\-])(\d{1,2})(?:\2(\d{1,2}))?(?![\d/\-])")
+YEAR_PATTERN = re.compile(r"(?<!\d)(20\d{2})(?!\d)")
+
+# Metadatos extraídos del nombre de una hoja. Año, mes y día son números o None;
+# label es el resto del nombre (por ejemplo "T2" en "ARG Febrero 2024 T2").
+@dataclass(frozen=True)
+class SheetNameInfo:
+    country: str
+    year: object
+    month: object
+    day: object
+    label: str
+
+    # Nombre del mes para mostrar y filtrar
+    @property
+    def month_name(self):
+        return MONTH_ORDER[self.month - 1] if self.month else "Sin mes específico"
+
+    @property
+    def year_label(self):
+        return str(self.year) if self.year else "Sin año"
+
+    # Clave para ordenar cronológicamente (lo desconocido va al final)
+    @property
+    def sort_key(self):
+        return (self.year or 9999, self.month or 99, self.day or 99)
+
+# Analizar el nombre de una hoja una sola vez (el resultado se memoriza)
+@functools.lru_cache(maxsize=8192)
+def parse_sheet_name(sheet_name):
+    # Fecha válida del calendario (sin año se usa uno bisiesto para aceptar el 29/02)
+    def valid_date(year, month, day):
+        try:
+            datetime.date(year or 2000, month, day)
+        except ValueError:
+            return False
+        return True
+    
+    spans = []
+    
+    match = COUNTRY_PATTERN.search(sheet_name)
+    if match:
+        country = match.group(1)
+    else:
+        match = COUNTRY_ALIAS_PATTERN.search(sheet_name)
+        country = COUNTRY_ALIASES[match.group(1).lower()] if match else "Otro"
+    if match:
+        spans.append(match.span())
+    
+    year = month = day = None
+    match = MONTH_PATTERN.search(sheet_name)
+    if match:
+        month = MONTH_NUMBERS[match.group(2).lower()]
+        day = int(match.group(1)) if match.group(1) else None
+        spans.append(match.span())
+    
+    year_match = YEAR_PATTERN.search(sheet_name)
+    name_year = int(year_match.group(1)) if year_match else None
+    if day is not None and not valid_date(name_year, month, day):
+        # "31 de Febrero": se conserva el mes pero no el día
+        day = None
+    if month is None:
+        # Sin mes por nombre: primero una fecha ISO completa (año, mes y día)
+        for match in ISO_DATE_PATTERN.finditer(sheet_name):
+            year_part, month_part = int(match.group(1)), int(match.group(3))
+            day_part = int(match.group(4)) if match.group(4) else None
+            if valid_date(year_part, month_part, day_part or 1):
+                year, month, day = year_part, month_part, day_part
+                spans.append(match.span())
+                break
+    if month is None:
+        # Si no, una fecha numérica DD/MM que no sea el año
+        for match in DATE_PATTERN.finditer(sheet_name):
+            if year_match and match.start() <= year_match.start() < match.end() and not match.group(3):
+                continue
+            day_part, month_part = int(match.group(1)), int(match.group(2))
+            year_part = None
+            if match.group(3):
+                year_part = int(match.group(3)) if len(match.group(3)) == 4 else 2000 + int(match.group(3))
+            if valid_date(year_part or name_year, month_part, day_part):
+                day, month, year = day_part, month_part, year_part
+                spans.append(match.span())
+                break
+    if year is None and year_match:
+        year = int(year_match.group(1))
+        spans.append(year_match.span())
+    
+    # La etiqueta es lo que queda al quitar país, fecha y año
+    label = sheet_name
+    for begin, finish in sorted(spans, reverse=True):
+        label = label[:begin] + " " + label[finish:]
+    label = " ".join(label.replace("_", " ").split()).strip(" -.,/")
+    return SheetNameInfo(country=country, year=year, month=month, day=day, label=label or sheet_name)
+
+# Extraer país del nombre de la hoja
+def extract_country_from_sheet_name(sheet_name):
+    return parse_sheet_name(sheet_name).country
+
+# Extraer mes del nombre de la hoja (por nombre en español o portugués, o por fecha DD/MM)
+def extract_month_from_sheet_name(sheet_name):
+    return parse_sheet_name(sheet_name).month_name
+
+# Extraer año del nombre de la hoja (por ejemplo "ARG Enero 2024")
+def extract_year_from_sheet_name(sheet_name):
+    return parse_sheet_name(sheet_name).year_label
+
+# Texto en minúsculas y sin espacios de una columna (NaN para celdas que no son texto)
+def _lowercase_text(column):
+    try:
+        return column.str.strip().str.lower()
+    except AttributeError:
+        # La columna no contiene texto (por ejemplo, solo números)
+        return pd.Series(np.nan, index=column.index, dtype=object)
+
+# Primera fila (posición) donde la máscara es verdadera, o None
+def _first_row(mask, start=0):
+    rows = np.flatnonzero(mask[start:])
+    return int(rows[0]) + start if len(rows) else None
+
+# Localizar las secciones de la hoja en una sola pasada vectorizada.
+# Devuelve un diccionario {sección: (fila del encabezado, fila final)} con las
+# secciones "resultados encuesta", "facilitadores", "fishbowl" y "verbatims",
+# más "metricas": {métrica: fila} para las filas de resultados encontradas.
+def locate_sections(df):
+    sections = {"metricas": {}}
+    n_rows = len(df)
+    if n_rows == 0 or len(df.columns) == 0:
+        return sections
+    
+    # Columna A en minúsculas, calculada una sola vez
+    col_a = df.iloc[:, 0]
+    text_a = _lowercase_text(col_a)
+    
+    # Métricas de la encuesta en las primeras 10 filas (gana la última aparición)
+    head = text_a.iloc[:10]
+    is_fav = head.str.contains("favorabilidad", regex=False, na=False).to_numpy()
+    is_aplic = head.str.contains("aplicabilidad", regex=False, na=False).to_numpy() & ~is_fav
+    is_resp = head.str.contains("response rate", regex=False, na=False).to_numpy() & ~is_fav & ~is_aplic
+    for metric, mask in (("Favorabilidad", is_fav), ("Aplicabilidad", is_aplic), ("Response Rate", is_resp)):
+        rows = np.flatnonzero(mask)
+        if len(rows):
+            sections["metricas"][metric] = int(rows[-1])
+    
+    resultados_row = _first_row(text_a.str.contains("resultados encuesta", regex=False, na=False).to_numpy())
+    if resultados_row is not None:
+        sections["resultados encuesta"] = (resultados_row, n_rows)
+    
+    # Facilitadores: hasta el encabezado de Fishbowl o una celda de texto vacía
+    facilitadores_row = _first_row(text_a.str.contains("facilitadores", regex=False, na=False).to_numpy())
+    if facilitadores_row is not None:
+        is_end = (text_a.str.contains("fishbowl", regex=False, na=False) | text_a.eq("")).to_numpy()
+        end_row = _first_row(is_end, facilitadores_row + 1)
+        sections["facilitadores"] = (facilitadores_row, n_rows if end_row is None else end_row)
+    
+    # Fishbowl: hasta encontrar 2 filas vacías consecutivas
+    fishbowl_row = _first_row(text_a.str.contains("fishbowl", regex=False, na=False).to_numpy())
+    if fishbowl_row is not None:
+        is_empty = (col_a.isna() | col_a.eq("")).to_numpy()
+        two_empty = np.zeros(n_rows, dtype=bool)
+        two_empty[:-1] = is_empty[:-1] & is_empty[1:]
+        end_row = _first_row(two_empty, fishbowl_row + 1)
+        sections["fishbowl"] = (fishbowl_row, n_rows if end_row is None else end_row)
+    
+    # VERBATIMS puede estar en cualquier columna: buscamos en todas las celdas de texto a la vez
+    text_columns = [i for i, dtype in enumerate(df.dtypes) if dtype == object or pd.api.types.is_string_dtype(dtype)]
+    if text_columns:
+        cells = pd.Series(df.iloc[:, text_columns].to_numpy().ravel())
+        is_verbatims = _lowercase_text(cells).str.contains("verbatims", regex=False, na=False).to_numpy()
+        verbatims_cell = _first_row(is_verbatims)
+        if verbatims_cell is not None:
+            sections["verbatims"] = (verbatims_cell // len(text_columns), n_rows)
+    
+    return sections
+
+# Función para verificar si una hoja tiene formato de taller
+def is_workshop_sheet(df, sheet_name, sections=None):
+    # Excluir explícitamente la hoja "Plantilla Base"
+    if sheet_name == "Plantilla Base":
+        return False
+    
+    if sections is None:
+        sections = locate_sections(df)
+    
+    # Es una hoja de taller si tiene al menos dos de los encabezados clave
+    criteria_met = [name in sections for name in ("resultados encuesta", "facilitadores", "fishbowl", "verbatims")]
+    return sum(criteria_met) >= 2
+
+# Facetas del índice de filtros y cómo ordenar sus valores
+FILTER_FACETS = {
+    "pais": sorted,
+    "mes": lambda values: sorted(values, key=lambda x: MONTH_ORDER.index(x) if x in MONTH_ORDER else 999),
+    "año": sorted,
+    "empresa": sorted,
+    "facilitador": sorted,
+    "facilitador_axialent": sorted
+}
+
+# Índice invertido de filtros: {faceta: {valor: conjunto de posiciones de talleres}}.
+# Dentro de una faceta los valores elegidos se unen y entre facetas se intersectan.
+@dataclass(frozen=True)
+class FilterIndex:
+    facets: dict
+    size: int
+
+    # Valores disponibles de una faceta, ya ordenados
+    def values(self, facet):
+        return list(self.facets.get(facet, {}))
+
+    # Posiciones (ordenadas) de los talleres que cumplen todos los filtros.
+    # Una selección vacía o que contiene "Todos" no filtra.
+    def select(self, selections):
+        result = None
+        for facet, values in selections.items():
+            if not values or "Todos" in values:
+                continue
+            index = self.facets.get(facet, {})
+            ids = frozenset().union(*(index.get(value, frozenset()) for value in values))
+            result = ids if result is None else result & ids
+        return list(range(self.size)) if result is None else sorted(result)
+
+# Pares (faceta, valor) por los que se puede filtrar un taller
+def workshop_facets(workshop):
+    facets = [("pais", workshop.country), ("mes", workshop.month), ("año", workshop.year)]
+    for facilitator in workshop.facilitadores:
+        # Registrar al facilitador en el índice general
+        facets.append(("facilitador", facilitator.name))
+        if facilitator.company:
+            facets.append(("empresa", facilitator.company))
+        
+        # Si es de Axialent, registrarlo también entre los facilitadores de Axialent
+        if facilitator.is_axialent:
+            facets.append(("facilitador_axialent", facilitator.name))
+    return facets
+
+# Ordenar los valores de una faceta para mostrarlos en los filtros
+def sort_facet_values(facet, values):
+    return FILTER_FACETS[facet](values)
+
+# Crear el índice de filtros de todos los talleres (país, mes, año, empresa y facilitadores)
+def build_filter_index(workshops):
+    facets = {facet: {} for facet in FILTER_FACETS}
+    for position, workshop in enumerate(workshops):
+        for facet, value in workshop_facets(workshop):
+            facets[facet].setdefault(value, set()).add(position)
+    
+    return FilterIndex(
+        facets={
+            facet: {value: frozenset(facets[facet][value]) for value in sort_facet_values(facet, facets[facet])}
+            for facet in FILTER_FACETS
+        },
+        size=len(workshops)
+    )
+
+# Métricas de la encuesta de cada taller
+SURVEY_METRICS = ["Favorabilidad", "Aplicabilidad", "Response Rate"]
+
+# Formatear una métrica (en porcentaje) para mostrarla, o "" si falta
+def format_metric(value):
+    if value is None or value != value:
+        return ""
+    return f"{value:.1f}".rstrip("0").rstrip(".") + "%"
+
+# Valor numérico (en porcentaje, 0-100) de una métrica de la encuesta, o NaN.
+# Los números de Excel son fracciones (0.875); los textos ya vienen en porcentaje ("87,5%").
+def parse_percentage(val):
+    if isinstance(val, bool):
+        return np.nan
+    if isinstance(val, (int, float)):
+        return float(val) * 100
+    if isinstance(val, str):
+        try:
+            return float(val.strip().rstrip("%").strip().replace(",", "."))
+        except ValueError:
+            return np.nan
+    return np.nan
+
+# Nombres válidos de una sección (columna A), descartando vacíos y "None" en cualquier
+# combinación de mayúsculas. Es el único sitio donde se filtran: el resto del código
+# confía en que los facilitadores y el fishbowl de un Workshop ya son nombres reales.
+def _valid_names(names):
+    cleaned = names.astype(str).str.strip()
+    return names.notna() & cleaned.ne("") & cleaned.str.lower().ne("none")
+
+# Nombres internados: los mismos facilitadores y empresas se repiten en cientos de
+# talleres y así comparten una sola copia de cada texto
+def _intern_name(value):
+    return sys.intern(str(value))
+
+# Función simplificada para extraer datos usando el mapa de secciones
+def extract_data_from_sheet(df, sections=None):
+    results = {
+        "facilitadores": (),
+        "fishbowl": (),
+        "verbatims": [],
+        "metricas": {},
+        "errores": []  # Errores de secciones concretas; el resto de la hoja se conserva
+    }
+    
+    if sections is None:
+        sections = locate_sections(df)
+    
+    try:
+        # 1. EXTRAER RESULTADOS DE ENCUESTA (filas localizadas en las primeras 10)
+        for metric in SURVEY_METRICS:
+            row = sections["metricas"].get(metric)
+            if row is not None:
+                # Guardar el valor numérico en porcentaje
+                results["metricas"][metric] = parse_percentage(df.iloc[row, 1])
+        
+    except Exception as e:
+        results["errores"].append(f"Error al extraer resultados de encuesta: {str(e)}")
+
+    try:
+        # 2. EXTRAER FACILITADORES (columnas A y B)
+        if "facilitadores" in sections:
+            start_row, end_row = sections["facilitadores"]
+            nombres = df.iloc[start_row + 1:end_row, 0]
+            empresas = df.iloc[start_row + 1:end_row, 1]
+            
+            # Solo incluir filas con datos válidos
+            valid = _valid_names(nombres)
+            results["facilitadores"] = tuple(
+                Facilitator(
+                    name=_intern_name(nombre),
+                    company=_intern_name(empresa.strip()) if isinstance(empresa, str) else ""
+                )
+                for nombre, empresa in zip(nombres[valid], empresas[valid])
+            )
+    except Exception as e:
+        results["errores"].append(f"Error al extraer facilitadores: {str(e)}")
+
+    try:
+        # 3. EXTRAER FISHBOWL (solo nombres)
+        if "fishbowl" in sections:
+            start_row, end_row = sections["fishbowl"]
+            nombres = df.iloc[start_row + 1:end_row, 0]
+            
+            # Solo incluir filas con datos válidos
+            valid = _valid_names(nombres)
+            results["fishbowl"] = tuple(_intern_name(nombre) for nombre in nombres[valid])
+    except Exception as e:
+        results["errores"].append(f"Error al extraer fishbowl: {str(e)}")
+
+    try:
+        # 4. EXTRAER VERBATIMS - SIEMPRE en columna D (índice 3)
+        # No buscamos la palabra VERBATIMS, simplemente extraemos todo de la columna D
+        verbatims_col = 3  # Corresponde a la columna D
+        
+        # Extraer todos los valores no vacíos de la columna D, excluyendo la palabra "VERBATIMS"
+        if verbatims_col < len(df.columns):
+            values = df.iloc[:, verbatims_col].dropna().astype(str).str.strip()
+            keep = values.ne("") & ~values.str.lower().str.contains("verbatims", regex=False)
+            results["verbatims"] = values[keep].tolist()
+    except Exception as e:
+        results["errores"].append(f"Error al extraer verbatims: {str(e)}")
+        
+    return results
+
+# Facilitador de un taller: nombre y empresa ("" si no figura)
+@dataclass(frozen=True, slots=True)
+class Facilitator:
+    name: str
+    company: str
+
+    @property
+    def is_axialent(self):
+        return self.company.lower() == "axialent"
+
+# Datos ya extraídos de una hoja de taller (inmutable y compacto: sin DataFrames,
+# que se crean solo al mostrar o exportar los datos)
+@dataclass(frozen=True, slots=True)
+class Workshop:
+    sheet_name: str
+    country: str
+    month: str
+    year: str
+    facilitadores: tuple  # Facilitator de cada fila válida
+    fishbowl: tuple  # Nombres de los participantes
+    verbatims: tuple
+    metric_values: tuple  # Valor en porcentaje de cada métrica de SURVEY_METRICS, NaN si falta
+    errores: tuple = ()  # Errores al extraer alguna sección de la hoja
+
+    # Los talleres se guardan en disco con pickle; los del histórico guardados por
+    # versiones anteriores (con DataFrames) se convierten al formato actual al leerlos
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            state = _legacy_workshop_state(state)
+        for name, value in zip(self.__dataclass_fields__, state):
+            object.__setattr__(self, name, value)
+
+    # {métrica: valor en porcentaje}, NaN si falta
+    @property
+    def metricas(self):
+        return dict(zip(SURVEY_METRICS, self.metric_values))
+
+    # País, fecha y etiqueta del taller según el nombre de la hoja
+    @property
+    def name_info(self):
+        return parse_sheet_name(self.sheet_name)
+
+    # Nombres de los facilitadores del taller, sin repetir
+    @property
+    def facilitator_names(self):
+        return tuple(dict.fromkeys(facilitator.name for facilitator in self.facilitadores))
+
+# Campos de un Workshop guardado antes de usar registros compactos
+def _legacy_workshop_state(state):
+    facilitadores = state.get("facilitadores")
+    fishbowl = state.get("fishbowl")
+    metricas = state.get("metricas", {})
+    if facilitadores is not None and not facilitadores.empty:
+        facilitadores = facilitadores[_valid_names(facilitadores["Nombre"])]
+    if fishbowl is not None and not fishbowl.empty:
+        fishbowl = fishbowl[_valid_names(fishbowl["Nombre"])]
+    return [
+        state["sheet_name"],
+        state["country"],
+        state["month"],
+        state["year"],
+        tuple(
+            Facilitator(_intern_name(nombre), _intern_name(empresa.strip()) if isinstance(empresa, str) else "")
+            for nombre, empresa in zip(facilitadores["Nombre"], facilitadores["Empresa"])
+        ) if facilitadores is not None and not facilitadores.empty else (),
+        tuple(_intern_name(nombre) for nombre in fishbowl["Nombre"]) if fishbowl is not None and not fishbowl.empty else (),
+        tuple(state.get("verbatims", ())),
+        tuple(metricas.get(metric, np.nan) for metric in SURVEY_METRICS),
+        tuple(state.get("errores", ()))
+    ]
+
+# Modelo completo de un libro Excel, reutilizado entre interacciones
+@dataclass(frozen=True)
+class WorkbookModel:
+    content_hash: str
+    workshops: tuple
+    errors: tuple  # Pares (nombre de hoja, mensaje de error)
+    filter_index: FilterIndex
+    metrics_table: pd.DataFrame
+    verbatim_index: VerbatimIndex
+    # Libro de origen de cada taller (vacío si todos vienen del mismo archivo)
+    sources: tuple = ()
+    # Acumulados por facilitador de todos los talleres (FacilitatorRollups), calculados al cargar
+    rollups: object = None
+
+    @property
+    def sheet_names(self):
+        return [workshop.sheet_name for workshop in self.workshops]
+
+# Hash del contenido del archivo, usado como clave de la caché
+def hash_workbook_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+# Columnas que usa la extracción: A (nombres), B (valores y Empresa), C y D (verbatims)
+SHEET_COLUMNS = ["A", "B", "C", "D"]
+
+# Textos que pandas interpreta como celdas vacías al leer Excel
+NA_STRINGS = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+              "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None",
+              "n/a", "nan", "null"}
+
+# Convertir el valor de una celda igual que pd.read_excel
+def _convert_cell(value):
+    if value is None:
+        return np.nan
+    if isinstance(value, str):
+        return np.nan if value in NA_STRINGS or value in ERROR_CODES else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+# Fila sin datos en las columnas leídas
+EMPTY_ROW = (np.nan,) * len(SHEET_COLUMNS)
+
+# Leer una hoja en modo streaming, solo columnas A-D y hasta la última fila con datos.
+# Igual que pd.read_excel, la primera fila se toma como encabezado.
+def read_sheet_columns(worksheet):
+    worksheet.reset_dimensions()
+    rows = []
+    # Filas vacías aún sin datos debajo: solo se cuentan y se agregan si aparece una fila
+    # con datos, así las miles de filas vacías con formato del final no ocupan memoria
+    pending = 0
+    header = True
+    for row in worksheet.iter_rows(min_col=1, max_col=len(SHEET_COLUMNS), values_only=True):
+        if header:
+            header = False
+            continue
+        values = tuple(_convert_cell(value) for value in row)
+        if any(isinstance(value, str) or pd.notna(value) for value in values):
+            rows.extend([EMPTY_ROW] * pending)
+            pending = 0
+            rows.append(values)
+        else:
+            pending += 1
+    return pd.DataFrame(rows, columns=SHEET_COLUMNS, dtype=object)
+
+# Libro abierto para lectura: streaming con openpyxl para .xlsx y pandas para .xls
+class WorkbookReader:
+    def __init__(self, data):
+        if data[:4] == b"PK\x03\x04":
+            self.book = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True, keep_links=False)
+            self.sheet_names = self.book.sheetnames
+        else:
+            self.book = pd.ExcelFile(io.BytesIO(data))
+            self.sheet_names = self.book.sheet_names
+
+    def read(self, sheet_name):
+        if isinstance(self.book, pd.ExcelFile):
+            return self.book.parse(sheet_name)
+        return read_sheet_columns(self.book[sheet_name])
+
+    def close(self):
+        self.book.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# Versión del formato extraído; cambiarla invalida las huellas guardadas en caché
+PARSER_VERSION = "9"
+
+# Espacios de nombres XML de un archivo .xlsx
+_XLSX_NS = {
+    "main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+}
+
+# Celdas que apuntan a la tabla de textos compartidos
+_SHARED_STRING_CELL = re.compile(rb'(<c\b[^>]*\bt="s"[^>]*>\s*<v>)(\d+)(</v>)')
+
+# Textos compartidos del libro (xl/sharedStrings.xml)
+def _read_shared_strings(archive):
+    try:
+        root = ET.fromstring(archive.read("xl/sharedStrings.xml"))
+    except KeyError:
+        return []
+    return ["".join(si.itertext()) for si in root.findall("main:si", _XLSX_NS)]
+
+# Pares (nombre de hoja, ruta del XML de la hoja dentro del archivo)
+def _sheet_parts(archive):
+    workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): rel.get("Target") for rel in rels.findall("rel:Relationship", _XLSX_NS)}
+    parts = []
+    for sheet in workbook.iterfind("main:sheets/main:sheet", _XLSX_NS):
+        target = targets.get(sheet.get(f"{{{_XLSX_NS['r']}}}id"), "")
+        part = target.lstrip("/") if target.startswith("/") else "xl/" + target
+        parts.append((sheet.get("name"), part))
+    return parts
+
+# Huella del contenido de cada hoja de un .xlsx, sin procesar sus celdas.
+# Los índices de textos compartidos se sustituyen por el texto, de modo que una
+# hoja nueva que reordene la tabla compartida no invalida las demás hojas.
+def sheet_fingerprints(data):
+    if data[:4] != b"PK\x03\x04":
+        return {}
+    fingerprints = {}
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        shared_strings = _read_shared_strings(archive)
+        
+        def resolve(match):
+            index = int(match.group(2))
+            text = shared_strings[index] if index < len(shared_strings) else ""
+            return match.group(1) + text.encode("utf-8") + match.group(3)
+        
+        for sheet_name, part in _sheet_parts(archive):
+            try:
+                xml = archive.read(part)
+            except KeyError:
+                continue
+            digest = hashlib.sha256(f"{PARSER_VERSION}\0{sheet_name}\0".encode("utf-8"))
+            digest.update(_SHARED_STRING_CELL.sub(resolve, xml))
+            fingerprints[sheet_name] = digest.hexdigest()
+    return fingerprints
+
+# Clasificar y extraer una hoja ya abierta.
+# Devuelve (nombre de hoja, Workshop o None, mensaje de error o None)
+def parse_sheet(reader, sheet_name, profile=None):
+    start = time.perf_counter()
+    rows = 0
+    result = (sheet_name, None, None)
+    try:
+        with profile_stage(profile, "lectura"):
+            df = reader.read(sheet_name)
+        rows = len(df)
+        with profile_stage(profile, "secciones"):
+            sections = locate_sections(df)
+        if is_workshop_sheet(df, sheet_name, sections):
+            with profile_stage(profile, "extracción"):
+                taller_data = extract_data_from_sheet(df, sections)
+                name_info = parse_sheet_name(sheet_name)
+                workshop = Workshop(
+                    sheet_name=sheet_name,
+                    country=name_info.country,
+                    month=name_info.month_name,
+                    year=name_info.year_label,
+                    facilitadores=taller_data["facilitadores"],
+                    fishbowl=taller_data["fishbowl"],
+                    verbatims=tuple(taller_data["verbatims"]),
+                    metric_values=tuple(taller_data["metricas"].get(metric, np.nan) for metric in SURVEY_METRICS),
+                    errores=tuple(taller_data["errores"])
+                )
+            result = (sheet_name, workshop, None)
+    except Exception as e:
+        result = (sheet_name, None, str(e))
+    
+    if profile is not None:
+        profile.add_sheet(sheet_name, time.perf_counter() - start, rows, result[1] is not None, result[2])
+    return result
+
+# Tarea de un proceso del pool: abre su propia copia del libro y procesa sus hojas
+def parse_sheets(data, sheet_names, profile=None):
+    with profile_stage(profile, "apertura"):
+        reader = WorkbookReader(data)
+    with reader:
+        return [parse_sheet(reader, sheet_name, profile) for sheet_name in sheet_names]
+
+# Tarea del pool con perfil propio, que se devuelve para sumarlo al del proceso principal
+def parse_sheets_profiled(data, sheet_names):
+    profile = IngestProfile()
+    return parse_sheets(data, sheet_names, profile), profile
+
+# Procesar varias hojas repartidas entre un pool de procesos
+def _parse_in_pool(data, sheet_names, workers, profile=None):
+    # Repartir las hojas de forma intercalada para equilibrar la carga
+    workers = min(workers, len(sheet_names))
+    chunks = [sheet_names[i::workers] for i in range(workers)]
+    
+    # "spawn" evita heredar los hilos del servidor de Streamlit en los procesos hijos
+    parsed = {}
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        if profile is None:
+            chunk_outputs = ((results, None) for results in pool.map(parse_sheets, [data] * workers, chunks))
+        else:
+            chunk_outputs = pool.map(parse_sheets_profiled, [data] * workers, chunks)
+        for chunk_results, chunk_profile in chunk_outputs:
+            if chunk_profile is not None:
+                profile.merge(chunk_profile)
+            for result in chunk_results:
+                parsed[result[0]] = result
+    return parsed
+
+# Procesar todas las hojas del libro, en paralelo si workers > 1.
+# Con una caché (SheetCache) solo se procesan las hojas nuevas o modificadas.
+# Los resultados conservan el orden original de las hojas.
+# Con un perfil (IngestProfile) se miden las etapas y cada hoja.
+def parse_workbook(data, workers=1, cache=None, profile=None):
+    with profile_stage(profile, "huellas"):
+        fingerprints = sheet_fingerprints(data) if cache is not None else {}
+    with profile_stage(profile, "caché"):
+        cached = cache.get_many(fingerprints.values()) if fingerprints else {}
+    
+    with profile_stage(profile, "apertura"):
+        reader = WorkbookReader(data)
+    with reader:
+        sheet_names = reader.sheet_names
+        pending = [name for name in sheet_names if fingerprints.get(name) not in cached]
+        if workers <= 1 or len(pending) < 2:
+            parsed = {name: parse_sheet(reader, name, profile) for name in pending}
+        else:
+            parsed = None
+    if parsed is None:
+        parsed = _parse_in_pool(data, pending, workers, profile)
+    
+    # Guardar las hojas recién procesadas (las que fallaron se reintentan la próxima vez)
+    if fingerprints:
+        with profile_stage(profile, "caché"):
+            cache.put_many({
+                fingerprints[name]: workshop
+                for name, workshop, error in parsed.values()
+                if error is None and name in fingerprints
+            })
+    
+    if profile is not None:
+        profile.cache_hits += len(sheet_names) - len(pending)
+        profile.cache_misses += len(pending) if fingerprints else 0
+        for name in sheet_names:
+            if name not in parsed:
+                profile.add_sheet(name, 0.0, 0, cached[fingerprints[name]] is not None, cached=True)
+    
+    return [
+        parsed[name] if name in parsed else (name, cached[fingerprints[name]], None)
+        for name in sheet_names
+    ]
+
+# Tabla larga de métricas: una fila por taller y métrica, con el valor numérico
+# y las columnas de país, mes, año y facilitadores para agrupar sin releer hojas
+def build_metrics_table(workshops):
+    rows = [
+        {
+            "posicion": position,
+            "taller": workshop.sheet_name,
+            "pais": workshop.country,
+            "mes": workshop.month,
+            "año": workshop.year,
+            "facilitadores": workshop.facilitator_names,
+            "metrica": metric,
+            "valor": value
+        }
+        for position, workshop in enumerate(workshops)
+        for metric, value in zip(SURVEY_METRICS, workshop.metric_values)
+    ]
+    table = pd.DataFrame(rows, columns=["posicion", "taller", "pais", "mes", "año", "facilitadores", "metrica", "valor"])
+    table["valor"] = table["valor"].astype(float)
+    return table
+
+# Tablas normalizadas de talleres, facilitadores, fishbowl y verbatims.
+# source identifica el archivo de origen cuando se combinan varios libros.
+def build_tables(workshops, source=""):
+    # source: nombre del archivo de todos los talleres, o una lista con el de cada taller
+    sources = [source] * len(workshops) if isinstance(source, str) else source
+    talleres = []
+    facilitadores = []
+    fishbowl = []
+    verbatims = []
+    for workshop, workshop_source in zip(workshops, sources):
+        key = {"archivo": workshop_source, "hoja": workshop.sheet_name}
+        talleres.append({
+            **key,
+            "pais": workshop.country,
+            "mes": workshop.month,
+            "año": workshop.year,
+            "dia": workshop.name_info.day,
+            "etiqueta": workshop.name_info.label,
+            **dict(zip(SURVEY_METRICS, workshop.metric_values)),
+            "verbatims": len(workshop.verbatims)
+        })
+        facilitadores.extend(
+            {**key, "nombre": facilitator.name, "empresa": facilitator.company}
+            for facilitator in workshop.facilitadores
+        )
+        fishbowl.extend({**key, "nombre": nombre} for nombre in workshop.fishbowl)
+        verbatims.extend(
+            {**key, "orden": i + 1, "texto": verbatim}
+            for i, verbatim in enumerate(workshop.verbatims)
+        )
+    
+    talleres = pd.DataFrame(talleres, columns=["archivo", "hoja", "pais", "mes", "año", "dia", "etiqueta", *SURVEY_METRICS, "verbatims"])
+    talleres["dia"] = talleres["dia"].astype("Int64")
+    return {
+        "talleres": talleres,
+        "facilitadores": pd.DataFrame(facilitadores, columns=["archivo", "hoja", "nombre", "empresa"]),
+        "fishbowl": pd.DataFrame(fishbowl, columns=["archivo", "hoja", "nombre"]),
+        "verbatims": pd.DataFrame(verbatims, columns=["archivo", "hoja", "orden", "texto"])
+    }
+
+# Construir el modelo completo del libro
+def build_workbook_model(data, content_hash=None, workers=1, cache=None, profile=None):
+    workshops = []
+    errors = []
+    for sheet_name, workshop, error in parse_workbook(data, workers, cache, profile):
+        if error is not None:
+            errors.append((sheet_name, error))
+        elif workshop is not None:
+            workshops.append(workshop)
+            errors.extend((sheet_name, message) for message in workshop.errores)
+    
+    with profile_stage(profile, "índices"):
+        return WorkbookModel(
+            content_hash=content_hash or hash_workbook_bytes(data),
+            workshops=tuple(workshops),
+            errors=tuple(errors),
+            filter_index=build_filter_index(workshops),
+            metrics_table=build_metrics_table(workshops),
+            verbatim_index=build_verbatim_index(workshops)
+        )